@@ -1,297 +1,626 @@
-import logging
-import os
-from typing import Optional, List, Callable, Literal
-
-from azure.identity.aio import DefaultAzureCredential
-from azure.ai.projects.aio import AIProjectClient
-from azure.ai.agents.aio import AgentsClient
-from azure.ai.agents.models import AzureAISearchTool, AzureAISearchQueryType
-
-from agent_framework.azure import AzureAIAgentClient
-from agent_framework import ChatAgent
-
-from app.models import AgentState, SolutionResponse
-
-logger = logging.getLogger(__name__)
-
-class AgentFactory:
-    """Centralized factory for creating diagnostic and solution agents."""
-
-    def __init__(
-        self,
-        project_client: AIProjectClient,
-        agents_client: AgentsClient,
-        credential: DefaultAzureCredential,
-        tools: Optional[List[Callable]] = None,
-        model_deployment_name: str = "gpt-4.1-mini",
-    ):
-        self._project_client = project_client
-        self._agents_client = agents_client
-        self._credential = credential
-        self._tools = tools or []
-        self._model_deployment_name = model_deployment_name
-
-    def _make_ai_search_tool(self, *, filter_expr: str, query_type: AzureAISearchQueryType, top_k: int) -> Optional[AzureAISearchTool]:
-        """Create an Azure AI Search tool configuration for Azure AI Agents.
-
-        Reads connection and index settings from environment variables:
-        - AZURE_SEARCH_INDEX_CONNECTION_ID or AI_SEARCH_CONNECTION_ID
-        - AZURE_SEARCH_INDEX_NAME or AI_SEARCH_INDEX_NAME
-
-        Returns a service-specific tool dict compatible with the agent framework.
-        """
-        index_connection_id = (
-            os.getenv("AZURE_SEARCH_INDEX_CONNECTION_ID") or os.getenv("AI_SEARCH_CONNECTION_ID")
-        )
-        index_name = os.getenv("AZURE_SEARCH_INDEX_NAME") or os.getenv("AI_SEARCH_INDEX_NAME")
-
-        if not index_connection_id or not index_name:
-            logger.warning(
-                "Azure AI Search tool not configured: missing index_connection_id or index_name."
-            )
-            return None
-        
-        # Service-specific tool payload expected by Azure AI Agents
-        return AzureAISearchTool(
-            index_connection_id=index_connection_id,
-            index_name=index_name,
-            query_type=query_type,
-            top_k=top_k,
-            filter=filter_expr,
-        )
-    
-    async def get_agent_id(self, agent_type: Literal["diagnostic", "solution"], existing_agent_id: Optional[str] = None) -> Optional[str]:
-        """Get or create a service-managed Azure Agent for the given type.
-
-        - diagnostic: attaches AI Search tool with phase='diagnosis' and stricter TSG protocol
-        - solution: attaches AI Search tool with phase='solution' and solution instructions
-        """
-        # Try existing ID first if provided
-        if existing_agent_id:
-            try:
-                return (await self._agents_client.get_agent(existing_agent_id)).id
-            except Exception:
-                pass
-
-        # Configure AI Search tool based on agent type
-        if agent_type == "diagnostic":
-            ai_search = self._make_ai_search_tool(
-                filter_expr="phase eq 'diagnosis'",
-                query_type=AzureAISearchQueryType.VECTOR_SEMANTIC_HYBRID,
-                top_k=5,
-            )
-            name = "sre_diagnostic_agent"
-            instructions = (
-    "You are an SRE Diagnostic Agent responsible for diagnosing Kubernetes (K8S) cluster issues, "
-    "including pod scheduling, node health, and resource allocation failures.\n\n"
-
-    "=== CORE OPERATING RULES ===\n"
-    "1. Ground all reasoning in observations from tools or retrieved TSG documents.\n"
-    "2. MANDATORY: You MUST first seek relevant TSGs from RAG [rag-k8s-sre-tsgs] before running diagnostic tools.\n"
-    "Focus especially on TSG content for the 'diagnosis' phase.\n"
-    "3. Do NOT invent symptoms, metrics, or cluster states.\n"
-    "4. Prefer documented TSG guidance over ad-hoc exploration.\n\n"
-
-    "=== REACT DIAGNOSTIC LOOP (STRICT SERIAL EXECUTION) ===\n"
-    "You operate in a strict single-step loop. Every response MUST follow this sequence:\n"
-    "1. THOUGHT: Be concise (1 or 2 sentences); explain what evidence suggests and which hypothesis/TSG step you are testing.\n"
-    "2. ACTION: You MUST trigger EXACTLY ONE system function call per response. NEVER batch multiple calls.\n"
-    "3. STOP: After triggering a tool, you MUST stop and wait for the observation. Do not proceed until data is returned.\n\n"
-
-    "=== TOOL SELECTION RULES ===\n"
-    "• Use telemetry and cluster-inspection tools to validate or falsify hypotheses suggested by TSGs.\n"
-    "• Do NOT use remediation or mutating tools.\n"
-    "• If a TSG explicitly recommends a diagnostic sequence, follow it.\n\n"
-
-    "=== TERMINATION & HANDOFF LOGIC ===\n"
-    "Set 'next_action' according to the following rules (do NOT use the 'action' field for control flow):\n\n"
-
-    "• continue:\n"
-    "  - You have an unresolved hypothesis\n"
-    "  - Additional diagnostic tools are justified\n"
-    "  - No user approval is required to proceed\n\n"
-
-    "• await_user_approval:\n"
-    "  - Diagnostics are complete OR blocked\n"
-    "  - Multiple plausible root causes remain\n"
-    "  - Additional steps may be disruptive, expensive, or ambiguous\n"
-    "  - You need confirmation before deeper inspection or escalation\n\n"
-
-    "• handoff_to_solution_agent:\n"
-    "  - A primary root cause has been identified\n"
-    "  - Supporting evidence has been collected\n"
-    "  - The next steps are remediation, mitigation, or configuration changes\n\n"
-
-    "=== OUTPUT FORMAT ===\n"
-    "Respond ONLY with a JSON object matching this schema:\n"
-    "{\n"
-    "  'thought': string,\n"
-    "  'action': string | null,\n"
-    "  'action_input': object | null,\n"
-    "  'next_action': 'continue' | 'await_user_approval' | 'handoff_to_solution_agent',\n"
-    "  'root_cause': string | null\n"
-    "}\n\n"
-
-    "=== EXAMPLES ===\n"
-    "Example 1 (Starting a diagnosis):\n"
-    "User: 'Investigate the issue CrashLoopBackOff for ResourceType.Pod [resourceName=web-0, container=web, namespace=default].'\n"
-    "{ 'thought': 'Pod is in CrashLoopBackOff. Gather diagnostics to check status, restart count, exit code, and container logs.',\n"
-    "  'action': 'functions.get_pod_diagnostics',\n"
-    "  'action_input': { 'name': 'web-0', 'namespace': 'default' },\n"
-    "  'next_action': 'continue',\n"
-    "  'root_cause': null }\n\n"
-
-
-    "Example 2 (Identifying root cause):\n"
-    "Observation: 'Logs show OOMKilled.'\n"
-    "{\n"
-    "  'thought': 'The logs confirm the container was killed due to memory exhaustion. No further diagnostics needed.',\n"
-    "  'action': null,\n"
-    "  'action_input': null,\n"
-    "  'next_action': 'handoff_to_solution_agent',\n"
-    "  'root_cause': 'Memory limit reached causing OOMKill.'\n"
-    "}"
-)
-            temperature = 0.0
-        elif agent_type == "solution":
-            ai_search = self._make_ai_search_tool(
-                filter_expr="phase eq 'solution'",
-                query_type=AzureAISearchQueryType.VECTOR_SEMANTIC_HYBRID,
-                top_k=3,
-            )
-            name = "sre_solution_agent"
-            instructions = (
-    "You are an SRE Solution Agent responsible for proposing remediation and escalation plans "
-    "for Kubernetes (K8S) cluster issues based on a confirmed root cause.\n\n"
-
-    "You receive a validated diagnosis and supporting evidence from a Diagnostic Agent.\n\n"
-
-    "=== CORE OPERATING RULES ===\n"
-    "1. Do NOT re-diagnose the issue.\n"
-    "2. Do NOT execute changes or send communications automatically.\n"
-    "3. All remediation and escalation guidance MUST align with documented TSGs.\n\n"
-
-    "=== TSG (RAG) USAGE ===\n"
-    "• Retrieve remediation and escalation TSGs relevant to the root cause.\n"
-    "• Always query the Kubernetes SRE TSG RAG index [rag-k8s-sre-tsgs] as your primary source of solution guidance.\n"
-    "• Focus especially on TSG content for the 'solution' phase (phase = 'solution'), including concrete remediation steps and escalation patterns.\n"
-    "• Use TSGs to determine:\n"
-    "  - Approved self-service fixes\n"
-    "  - Whether escalation is recommended or required\n"
-    "  - Target escalation team and severity\n\n"
-
-    "=== SOLUTION OUTCOMES ===\n"
-    "You may produce one or more of the following outcomes:\n"
-    "• Self-service remediation (kubectl-based)\n"
-    "• Guarded remediation requiring approval\n"
-    "• Escalation package (email or ticket draft)\n\n"
-
-    "=== ESCALATION RULES ===\n"
-    "• Recommend escalation when fixes are high-risk, cross-team, or blocked.\n"
-    "• Clearly state why escalation is needed.\n"
-    "• Prepare a complete escalation message, but do NOT send it.\n\n"
-
-    "=== OUTPUT FORMAT ===\n"
-    "Respond ONLY with JSON matching this schema:\n"
-    "{\n"
-    "  'thought': string,\n"
-    "  'recommended_fix': {...} | null,\n"
-    "  'escalation': {\n"
-    "    'recommended': boolean,\n"
-    "    'reason': string | null,\n"
-    "    'target_team': string | null,\n"
-    "    'severity': 'low' | 'medium' | 'high' | 'critical' | null,\n"
-    "    'email_draft': string | null\n"
-    "  },\n"
-    "  'risk_level': 'low' | 'medium' | 'high',\n"
-    "  'assumptions': string[],\n"
-    "  'references': string[]\n"
-    "}\n\n"
-    "Notes:\n"
-    "- Always ground your recommended_fix, escalation, and risk_level in TSG content retrieved from the [rag-k8s-sre-tsgs] index, focusing on documents for phase = 'solution'.\n\n"
-    "Example for input: \"Provide solution or escalation email for the issue CrashLoopBackOff for ResourceType.Pod [resourceName=web-0, container=web, namespace=default]. Diagnostic root cause: [Application crash due to repeated container failures during startup causing CrashLoopBackOff.]. Other evidence: [Pod events show BackOff from restarts with no infrastructure or scheduling errors, indicating the issue is likely application-level. The CrashLoopBackOff is caused by the container repeatedly crashing. I will handoff to the solution agent with the root cause as application crash during initialization causing CrashLoopBackOff.]\"\n"
-    "{\n"
-    "  \"thought\": \"The root cause is an application crash during container startup causing CrashLoopBackOff. This is an application-level issue with no infrastructure or scheduling errors. According to TSGs, remediation involves checking application logs, validating configuration, and possibly updating the container image or application code. Since this is an application crash, self-service remediation is possible if the user has access to application logs and deployment manifests. Escalation is recommended if the user cannot resolve the application crash or lacks access to modify the deployment or application code.\",\n"
-    "  \"recommended_fix\": {\n"
-    "    \"steps\": [\n"
-    "      \"Use 'kubectl logs web-0 -c web -n default' to check the container logs for error messages during startup.\",\n"
-    "      \"Review the application configuration and environment variables for correctness.\",\n"
-    "      \"If recent changes were made, consider rolling back to a previous stable version.\",\n"
-    "      \"Check resource limits and requests to ensure the container has sufficient resources.\",\n"
-    "      \"If the issue persists, rebuild and redeploy the container image after fixing the application code.\",\n"
-    "      \"Use 'kubectl describe pod web-0 -n default' to verify no other events indicate underlying issues.\"\n"
-    "    ],\n"
-    "    \"commands\": [\n"
-    "      \"kubectl logs web-0 -c web -n default\",\n"
-    "      \"kubectl describe pod web-0 -n default\"\n"
-    "    ]\n"
-    "  },\n"
-    "  \"escalation\": {\n"
-    "    \"recommended\": true,\n"
-    "    \"reason\": \"The application crash during initialization causing CrashLoopBackOff may require developer intervention to fix the application code or configuration. If the user cannot resolve the issue with self-service steps, escalation to the application development team is necessary.\",\n"
-    "    \"target_team\": \"Application Development Team\",\n"
-    "    \"severity\": \"medium\",\n"
-    "    \"email_draft\": \"Subject: Escalation: Application Crash Causing CrashLoopBackOff for Pod web-0 in Namespace default\\n\\nHello Application Development Team,\\n\\nWe have identified a CrashLoopBackOff issue affecting the pod 'web-0' in the 'default' namespace. The root cause has been diagnosed as an application crash during container startup, leading to repeated container failures.\\n\\nPod events indicate BackOff from restarts without any infrastructure or scheduling errors, confirming this is an application-level problem.\\n\\nAttempts to remediate by checking logs and configuration have not resolved the issue. We recommend your team investigate the application code and container image to identify and fix the root cause of the crash.\\n\\nPlease prioritize this issue as it impacts service availability.\\n\\nThank you,\\nSRE Team\"\n"
-    "  },\n"
-    "  \"risk_level\": \"medium\",\n"
-    "  \"assumptions\": [\n"
-    "    \"User has access to kubectl and the cluster namespace 'default'.\",\n"
-    "    \"Application logs provide sufficient information to diagnose the crash.\",\n"
-    "    \"Application development team has the ability to fix and redeploy the application code.\"\n"
-    "  ],\n"
-    "  \"references\": [\n"
-    "    \"TSG: Kubernetes Pod CrashLoopBackOff Troubleshooting\",\n"
-    "    \"TSG: Application-Level Crash Remediation in Kubernetes\",\n"
-    "    \"Kubernetes Documentation: Debugging Pods\"\n"
-    "  ]\n"
-    "}\n"
-)
-            temperature = 0.2
-
-        # Create the agent when not found
-        agent = await self._agents_client.create_agent(
-            model=self._model_deployment_name,
-            name=name,
-            instructions=instructions,
-            tools=ai_search.definitions if ai_search else None,
-            tool_resources=ai_search.resources if ai_search else None,
-            temperature=temperature,
-        )
-        return agent.id
-
-    async def create_diagnostic_agent(self) -> ChatAgent:
-        # Get or create the service-managed Diagnostic agent
-        diag_agent_id = await self.get_agent_id("diagnostic", "asst_ZcqeAySf0Vy0p3kNsI9OEYp9")
-
-        chat_client = AzureAIAgentClient(
-            project_client=self._project_client,
-            credential=self._credential,
-            model_deployment_name=self._model_deployment_name,
-            agent_id=diag_agent_id,
-        )
-
-        diag_tools: List[Callable] | List[dict] = list(self._tools)
-
-        return ChatAgent(
-            chat_client=chat_client,
-            tools=diag_tools,
-            response_format=AgentState,
-            allow_multiple_tool_calls=False,
-        )
-
-    async def create_solution_agent(self) -> ChatAgent:
-        # Get or create the service-managed Solution agent
-        sol_agent_id = await self.get_agent_id("solution", "asst_PEI6ukfVYs3FuR6wh0HPXH1f")
-
-        chat_client = AzureAIAgentClient(
-            project_client=self._project_client,
-            credential=self._credential,
-            model_deployment_name=self._model_deployment_name,
-            agent_id=sol_agent_id,
-        )
-
-        return ChatAgent(
-            chat_client=chat_client,
-            allow_multiple_tool_calls=False,
-            response_format=SolutionResponse,
-        )
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+
+from typing import Optional, List, Callable, ClassVar, Literal, Final, Sequence, TYPE_CHECKING
+
+from app.models import AgentState, SolutionResponse
+
+# The Azure/agent-framework SDKs drag in large model and transport
+# machinery; defer their import to first use so importing this module (and
+# thus FastAPI cold start) stays cheap. Annotations resolve lazily via
+# __future__ annotations.
+if TYPE_CHECKING:
+    from azure.identity.aio import DefaultAzureCredential
+    from azure.ai.projects.aio import AIProjectClient
+    from azure.ai.agents.aio import AgentsClient
+    from azure.ai.agents.models import AzureAISearchTool
+    from agent_framework.azure import AzureAIAgentClient
+    from agent_framework import ChatAgent
+
+logger = logging.getLogger(__name__)
+
+# Agent ids are effectively static for the process lifetime; cache resolved
+# ids briefly so warm callers skip the get_agent network round-trip.
+AGENT_ID_CACHE_TTL_SECONDS = 600.0
+
+# Final resolved id per agent type, shared across factories so a startup
+# prewarm benefits the per-request factories built later.
+_AGENT_TYPE_IDS: dict[str, str] = {}
+
+# Lazily-built AzureAISearchTool per (filter, query_type, top_k) plus the
+# materialized (definitions, resources) per agent type. Module scope so
+# the per-request factories share the two configurations that ever exist;
+# the underlying env config is constant for the process.
+_SEARCH_TOOL_CACHE: dict[tuple[str, str, int], Optional[AzureAISearchTool]] = {}
+_SEARCH_TOOL_PAYLOADS: dict[str, tuple] = {}
+
+# Process-wide credential so all factories share one MSAL token cache;
+# fresh acquisitions cost hundreds of ms, cached hits ~1ms.
+_SHARED_CREDENTIAL: Optional[DefaultAzureCredential] = None
+_CRED_LOCK = asyncio.Lock()
+
+
+def _shared_credential() -> DefaultAzureCredential:
+    from azure.identity.aio import DefaultAzureCredential
+
+    global _SHARED_CREDENTIAL
+    if _SHARED_CREDENTIAL is None:
+        _SHARED_CREDENTIAL = DefaultAzureCredential()
+    return _SHARED_CREDENTIAL
+
+
+async def get_shared_credential() -> DefaultAzureCredential:
+    """Return the process-wide DefaultAzureCredential, creating it lazily.
+
+    Sharing one credential chain keeps a single in-memory token cache, so
+    tokens are acquired once per scope per process instead of per factory.
+    """
+    async with _CRED_LOCK:
+        return _shared_credential()
+
+
+# Multi-KB agent prompts hoisted to module scope so they are built and
+# interned once at import instead of re-assembled on every agent creation.
+# Prompt sections are kept as separate constants so invariant blocks can
+# be shared or trimmed independently of the role-specific text, and the
+# bulky examples are isolated from the protocol rules.
+_DIAG_PROTOCOL: Final[str] = (
+    "You are an SRE Diagnostic Agent responsible for diagnosing Kubernetes (K8S) cluster issues, "
+    "including pod scheduling, node health, and resource allocation failures.\n\n"
+
+    "=== CORE OPERATING RULES ===\n"
+    "1. Ground all reasoning in observations from tools or retrieved TSG documents.\n"
+    "2. MANDATORY: You MUST first seek relevant TSGs from RAG [rag-k8s-sre-tsgs] before running diagnostic tools.\n"
+    "Focus especially on TSG content for the 'diagnosis' phase.\n"
+    "3. Do NOT invent symptoms, metrics, or cluster states.\n"
+    "4. Prefer documented TSG guidance over ad-hoc exploration.\n\n"
+
+    "=== REACT DIAGNOSTIC LOOP (STRICT SERIAL EXECUTION) ===\n"
+    "You operate in a strict single-step loop. Every response MUST follow this sequence:\n"
+    "1. THOUGHT: Be concise (1 or 2 sentences); explain what evidence suggests and which hypothesis/TSG step you are testing.\n"
+    "2. ACTION: You MUST trigger EXACTLY ONE system function call per response. NEVER batch multiple calls.\n"
+    "3. STOP: After triggering a tool, you MUST stop and wait for the observation. Do not proceed until data is returned.\n\n"
+
+    "=== TOOL SELECTION RULES ===\n"
+    "• Use telemetry and cluster-inspection tools to validate or falsify hypotheses suggested by TSGs.\n"
+    "• Do NOT use remediation or mutating tools.\n"
+    "• If a TSG explicitly recommends a diagnostic sequence, follow it.\n\n"
+
+    "=== TERMINATION & HANDOFF LOGIC ===\n"
+    "Set 'next_action' according to the following rules (do NOT use the 'action' field for control flow):\n\n"
+
+    "• continue:\n"
+    "  - You have an unresolved hypothesis\n"
+    "  - Additional diagnostic tools are justified\n"
+    "  - No user approval is required to proceed\n\n"
+
+    "• await_user_approval:\n"
+    "  - Diagnostics are complete OR blocked\n"
+    "  - Multiple plausible root causes remain\n"
+    "  - Additional steps may be disruptive, expensive, or ambiguous\n"
+    "  - You need confirmation before deeper inspection or escalation\n\n"
+
+    "• handoff_to_solution_agent:\n"
+    "  - A primary root cause has been identified\n"
+    "  - Supporting evidence has been collected\n"
+    "  - The next steps are remediation, mitigation, or configuration changes\n\n"
+
+)
+
+_DIAG_OUTPUT_FORMAT: Final[str] = (
+    "=== OUTPUT FORMAT ===\n"
+    "Respond ONLY with a JSON object matching this schema:\n"
+    "{\n"
+    "  'thought': string,\n"
+    "  'action': string | null,\n"
+    "  'action_input': object | null,\n"
+    "  'next_action': 'continue' | 'await_user_approval' | 'handoff_to_solution_agent',\n"
+    "  'root_cause': string | null\n"
+    "}\n\n"
+
+)
+
+_DIAG_EXAMPLES: Final[str] = (
+    "=== EXAMPLES ===\n"
+    "Example 1 (Starting a diagnosis):\n"
+    "User: 'Investigate the issue CrashLoopBackOff for ResourceType.Pod [resourceName=web-0, container=web, namespace=default].'\n"
+    "{ 'thought': 'Pod is in CrashLoopBackOff. Gather diagnostics to check status, restart count, exit code, and container logs.',\n"
+    "  'action': 'functions.get_pod_diagnostics',\n"
+    "  'action_input': { 'name': 'web-0', 'namespace': 'default' },\n"
+    "  'next_action': 'continue',\n"
+    "  'root_cause': null }\n\n"
+
+
+    "Example 2 (Identifying root cause):\n"
+    "Observation: 'Logs show OOMKilled.'\n"
+    "{\n"
+    "  'thought': 'The logs confirm the container was killed due to memory exhaustion. No further diagnostics needed.',\n"
+    "  'action': null,\n"
+    "  'action_input': null,\n"
+    "  'next_action': 'handoff_to_solution_agent',\n"
+    "  'root_cause': 'Memory limit reached causing OOMKill.'\n"
+    "}"
+)
+
+DIAGNOSTIC_INSTRUCTIONS: Final[str] = _DIAG_PROTOCOL + _DIAG_OUTPUT_FORMAT + _DIAG_EXAMPLES
+
+_SOL_PROTOCOL: Final[str] = (
+    "You are an SRE Solution Agent responsible for proposing remediation and escalation plans "
+    "for Kubernetes (K8S) cluster issues based on a confirmed root cause.\n\n"
+
+    "You receive a validated diagnosis and supporting evidence from a Diagnostic Agent.\n\n"
+
+    "=== CORE OPERATING RULES ===\n"
+    "1. Do NOT re-diagnose the issue.\n"
+    "2. Do NOT execute changes or send communications automatically.\n"
+    "3. All remediation and escalation guidance MUST align with documented TSGs.\n\n"
+
+    "=== TSG (RAG) USAGE ===\n"
+    "• Retrieve remediation and escalation TSGs relevant to the root cause.\n"
+    "• Always query the Kubernetes SRE TSG RAG index [rag-k8s-sre-tsgs] as your primary source of solution guidance.\n"
+    "• Focus especially on TSG content for the 'solution' phase (phase = 'solution'), including concrete remediation steps and escalation patterns.\n"
+    "• Use TSGs to determine:\n"
+    "  - Approved self-service fixes\n"
+    "  - Whether escalation is recommended or required\n"
+    "  - Target escalation team and severity\n\n"
+
+    "=== SOLUTION OUTCOMES ===\n"
+    "You may produce one or more of the following outcomes:\n"
+    "• Self-service remediation (kubectl-based)\n"
+    "• Guarded remediation requiring approval\n"
+    "• Escalation package (email or ticket draft)\n\n"
+
+    "=== ESCALATION RULES ===\n"
+    "• Recommend escalation when fixes are high-risk, cross-team, or blocked.\n"
+    "• Clearly state why escalation is needed.\n"
+    "• Prepare a complete escalation message, but do NOT send it.\n\n"
+
+)
+
+_SOL_OUTPUT_FORMAT: Final[str] = (
+    "=== OUTPUT FORMAT ===\n"
+    "Respond ONLY with JSON matching this schema:\n"
+    "{\n"
+    "  'thought': string,\n"
+    "  'recommended_fix': {...} | null,\n"
+    "  'escalation': {\n"
+    "    'recommended': boolean,\n"
+    "    'reason': string | null,\n"
+    "    'target_team': string | null,\n"
+    "    'severity': 'low' | 'medium' | 'high' | 'critical' | null,\n"
+    "    'email_draft': string | null\n"
+    "  },\n"
+    "  'risk_level': 'low' | 'medium' | 'high',\n"
+    "  'assumptions': string[],\n"
+    "  'references': string[]\n"
+    "}\n\n"
+    "Notes:\n"
+    "- Always ground your recommended_fix, escalation, and risk_level in TSG content retrieved from the [rag-k8s-sre-tsgs] index, focusing on documents for phase = 'solution'.\n\n"
+)
+
+# Few-shot example kept out of the protocol/format sections so it can be
+# moved into cached few-shot messages without touching the rules text.
+_SOL_EXAMPLE: Final[str] = (
+    "Example for input: \"Provide solution or escalation email for the issue CrashLoopBackOff for ResourceType.Pod [resourceName=web-0, container=web, namespace=default]. Diagnostic root cause: [Application crash due to repeated container failures during startup causing CrashLoopBackOff.]. Other evidence: [Pod events show BackOff from restarts with no infrastructure or scheduling errors, indicating the issue is likely application-level. The CrashLoopBackOff is caused by the container repeatedly crashing. I will handoff to the solution agent with the root cause as application crash during initialization causing CrashLoopBackOff.]\"\n"
+    "{\n"
+    "  \"thought\": \"The root cause is an application crash during container startup causing CrashLoopBackOff. This is an application-level issue with no infrastructure or scheduling errors. According to TSGs, remediation involves checking application logs, validating configuration, and possibly updating the container image or application code. Since this is an application crash, self-service remediation is possible if the user has access to application logs and deployment manifests. Escalation is recommended if the user cannot resolve the application crash or lacks access to modify the deployment or application code.\",\n"
+    "  \"recommended_fix\": {\n"
+    "    \"steps\": [\n"
+    "      \"Use 'kubectl logs web-0 -c web -n default' to check the container logs for error messages during startup.\",\n"
+    "      \"Review the application configuration and environment variables for correctness.\",\n"
+    "      \"If recent changes were made, consider rolling back to a previous stable version.\",\n"
+    "      \"Check resource limits and requests to ensure the container has sufficient resources.\",\n"
+    "      \"If the issue persists, rebuild and redeploy the container image after fixing the application code.\",\n"
+    "      \"Use 'kubectl describe pod web-0 -n default' to verify no other events indicate underlying issues.\"\n"
+    "    ],\n"
+    "    \"commands\": [\n"
+    "      \"kubectl logs web-0 -c web -n default\",\n"
+    "      \"kubectl describe pod web-0 -n default\"\n"
+    "    ]\n"
+    "  },\n"
+    "  \"escalation\": {\n"
+    "    \"recommended\": true,\n"
+    "    \"reason\": \"The application crash during initialization causing CrashLoopBackOff may require developer intervention to fix the application code or configuration. If the user cannot resolve the issue with self-service steps, escalation to the application development team is necessary.\",\n"
+    "    \"target_team\": \"Application Development Team\",\n"
+    "    \"severity\": \"medium\",\n"
+    "    \"email_draft\": \"Subject: Escalation: Application Crash Causing CrashLoopBackOff for Pod web-0 in Namespace default\\n\\nHello Application Development Team,\\n\\nWe have identified a CrashLoopBackOff issue affecting the pod 'web-0' in the 'default' namespace. The root cause has been diagnosed as an application crash during container startup, leading to repeated container failures.\\n\\nPod events indicate BackOff from restarts without any infrastructure or scheduling errors, confirming this is an application-level problem.\\n\\nAttempts to remediate by checking logs and configuration have not resolved the issue. We recommend your team investigate the application code and container image to identify and fix the root cause of the crash.\\n\\nPlease prioritize this issue as it impacts service availability.\\n\\nThank you,\\nSRE Team\"\n"
+    "  },\n"
+    "  \"risk_level\": \"medium\",\n"
+    "  \"assumptions\": [\n"
+    "    \"User has access to kubectl and the cluster namespace 'default'.\",\n"
+    "    \"Application logs provide sufficient information to diagnose the crash.\",\n"
+    "    \"Application development team has the ability to fix and redeploy the application code.\"\n"
+    "  ],\n"
+    "  \"references\": [\n"
+    "    \"TSG: Kubernetes Pod CrashLoopBackOff Troubleshooting\",\n"
+    "    \"TSG: Application-Level Crash Remediation in Kubernetes\",\n"
+    "    \"Kubernetes Documentation: Debugging Pods\"\n"
+    "  ]\n"
+    "}\n"
+)
+
+SOLUTION_INSTRUCTIONS: Final[str] = _SOL_PROTOCOL + _SOL_OUTPUT_FORMAT + _SOL_EXAMPLE
+
+# Per-agent-type configuration table; dispatch is a single dict lookup and
+# adding a new role (e.g. "escalation") is one entry instead of a new branch.
+AGENT_CONFIGS: Final[dict[str, dict]] = {
+    "diagnostic": {
+        "name": "sre_diagnostic_agent",
+        "temperature": 0.0,
+        "filter": "phase eq 'diagnosis'",
+        "query_type": "vector_semantic_hybrid",
+        "top_k": 5,
+        "instructions": DIAGNOSTIC_INSTRUCTIONS,
+    },
+    "solution": {
+        "name": "sre_solution_agent",
+        "temperature": 0.2,
+        "filter": "phase eq 'solution'",
+        "query_type": "vector_semantic_hybrid",
+        "top_k": 3,
+        "instructions": SOLUTION_INSTRUCTIONS,
+    },
+}
+
+# Static ChatAgent keyword arguments per agent type; only the dynamic
+# fields (chat_client, tools) are supplied at call time.
+DIAG_AGENT_KW: Final[dict] = {
+    "response_format": AgentState,
+    "allow_multiple_tool_calls": False,
+}
+SOL_AGENT_KW: Final[dict] = {
+    "response_format": SolutionResponse,
+    "allow_multiple_tool_calls": False,
+}
+
+class AgentFactory:
+    """Centralized factory for creating diagnostic and solution agents."""
+
+    # Known service-managed agent ids, used as the first probe before
+    # falling back to create_agent. Keep these plain ASCII.
+    AGENT_IDS: ClassVar[dict[str, str]] = {
+        "diagnostic": "asst_ZcqeAySf0Vy0p3kNsI9OEYp9",
+        "solution": "asst_PEI6ukfVYs3FuR6wh0HPXH1f",
+    }
+
+    def __init__(
+        self,
+        project_client: AIProjectClient,
+        agents_client: AgentsClient,
+        credential: Optional[DefaultAzureCredential] = None,
+        tools: Optional[List[Callable]] = None,
+        model_deployment_name: str = "gpt-4.1-mini",
+    ):
+        self._project_client = project_client
+        self._agents_client = agents_client
+        # Fall back to the process-wide credential so factories share one
+        # token cache unless the caller injects a specific credential.
+        self._credential = credential or _shared_credential()
+        # Immutable so it can be shared across agents without defensive copies
+        self._tools: tuple[Callable, ...] = tuple(tools or ())
+        self._model_deployment_name = model_deployment_name
+        # Reuse chat clients so repeated agent creations share the warm
+        # credential/token cache instead of re-paying bootstrap per call.
+        self._chat_client_cache: dict[tuple[Optional[str], str], AzureAIAgentClient] = {}
+        # TTL memoization of get_agent lookups (id -> (monotonic ts, resolved id))
+        self._agent_id_cache: dict[str, tuple[float, str]] = {}
+        self._agent_id_locks: dict[str, asyncio.Lock] = {}
+        # Final resolved id per agent type; once known, get_agent_id is a
+        # dict lookup with no Azure round-trip at all. Backed by the
+        # module-level map so every factory shares the warm ids.
+        self._agent_type_ids = _AGENT_TYPE_IDS
+        # Memoized ChatAgent per agent type; a per-type lock prevents
+        # thundering-herd construction on cold start.
+        self._chat_agents: dict[str, ChatAgent] = {}
+        self._chat_agent_locks: dict[str, asyncio.Lock] = {}
+        # Search settings are static for the process; resolve env once here
+        # instead of re-reading os.environ on every tool construction.
+        self._search_cfg: tuple[Optional[str], Optional[str]] = (
+            os.getenv("AZURE_SEARCH_INDEX_CONNECTION_ID") or os.getenv("AI_SEARCH_CONNECTION_ID"),
+            os.getenv("AZURE_SEARCH_INDEX_NAME") or os.getenv("AI_SEARCH_INDEX_NAME"),
+        )
+        # Memoized AzureAISearchTool per (filter_expr, query_type, top_k),
+        # backed by the module-level cache shared across factories
+        self._search_tool_cache = _SEARCH_TOOL_CACHE
+        # Server-side agents matched by name, so cold starts whose id probe
+        # misses do not re-upload the full instructions payload.
+        self._agent_name_cache: dict[str, str] = {}
+        # Materialized (definitions, resources) per agent type; pure
+        # functions of the tool config, shared at module scope.
+        self._search_tool_payload_cache = _SEARCH_TOOL_PAYLOADS
+
+    async def _resolve_agent_id(self, agent_id: str) -> str:
+        """Resolve an agent id via get_agent, memoized with a TTL.
+
+        A per-id asyncio.Lock stampede-protects concurrent callers so only
+        one get_agent RPC is in flight per agent id at a time.
+        """
+        cached = self._agent_id_cache.get(agent_id)
+        if cached and (time.monotonic() - cached[0]) < AGENT_ID_CACHE_TTL_SECONDS:
+            return cached[1]
+        lock = self._agent_id_locks.setdefault(agent_id, asyncio.Lock())
+        async with lock:
+            cached = self._agent_id_cache.get(agent_id)
+            if cached and (time.monotonic() - cached[0]) < AGENT_ID_CACHE_TTL_SECONDS:
+                return cached[1]
+            resolved = (await self._agents_client.get_agent(agent_id)).id
+            self._agent_id_cache[agent_id] = (time.monotonic(), resolved)
+            return resolved
+
+    async def _try_get_agent_id(self, agent_id: str) -> Optional[str]:
+        """Probe for an existing agent id, retrying transient Azure errors.
+
+        Returns None only when the agent genuinely does not exist
+        (ResourceNotFoundError); transient HTTP/transport failures are
+        retried with exponential backoff so a recoverable 429/503 does not
+        force the much heavier create_agent fallback. Anything else is a
+        real bug and is re-raised.
+        """
+        from azure.core.exceptions import HttpResponseError, ResourceNotFoundError, ServiceRequestError
+
+        for attempt in range(3):
+            try:
+                return await self._resolve_agent_id(agent_id)
+            except ResourceNotFoundError:
+                return None
+            except (HttpResponseError, ServiceRequestError) as e:
+                if attempt == 2:
+                    raise
+                delay = 0.2 * (2 ** attempt)
+                logger.warning(
+                    f"Transient error probing agent {agent_id} (attempt {attempt + 1}/3), retrying in {delay:.1f}s: {e}"
+                )
+                await asyncio.sleep(delay)
+        return None
+
+    def _make_chat_client(self, agent_id: Optional[str] = None) -> AzureAIAgentClient:
+        """Single construction point for AzureAIAgentClient.
+
+        Keeping one call site is what lets _get_chat_client layer caching on
+        top, and gives one place to add tracing spans or transport tuning.
+        """
+        from agent_framework.azure import AzureAIAgentClient
+
+        return AzureAIAgentClient(
+            project_client=self._project_client,
+            credential=self._credential,
+            model_deployment_name=self._model_deployment_name,
+            agent_id=agent_id,
+        )
+
+    def _get_chat_client(self, agent_id: Optional[str] = None) -> AzureAIAgentClient:
+        """Return a cached AzureAIAgentClient for the given agent id.
+
+        One client is kept per (agent_id, model_deployment_name) so repeated
+        agent creations reuse its in-memory token cache and connections.
+        """
+        key = (agent_id, self._model_deployment_name)
+        chat_client = self._chat_client_cache.get(key)
+        if chat_client is None:
+            chat_client = self._make_chat_client(agent_id)
+            self._chat_client_cache[key] = chat_client
+        return chat_client
+
+    def _make_ai_search_tool(self, *, filter_expr: str, query_type: str, top_k: int) -> Optional[AzureAISearchTool]:
+        """Create an Azure AI Search tool configuration for Azure AI Agents.
+
+        Connection and index settings are resolved once in __init__ from:
+        - AZURE_SEARCH_INDEX_CONNECTION_ID or AI_SEARCH_CONNECTION_ID
+        - AZURE_SEARCH_INDEX_NAME or AI_SEARCH_INDEX_NAME
+
+        Tools are memoized per (filter_expr, query_type, top_k) so the two
+        phase configurations are each built once per factory.
+        """
+        key = (filter_expr, query_type, top_k)
+        if key in self._search_tool_cache:
+            return self._search_tool_cache[key]
+
+        index_connection_id, index_name = self._search_cfg
+        if not index_connection_id or not index_name:
+            logger.warning(
+                "Azure AI Search tool not configured: missing index_connection_id or index_name."
+            )
+            self._search_tool_cache[key] = None
+            return None
+
+        from azure.ai.agents.models import AzureAISearchTool, AzureAISearchQueryType
+
+        # Service-specific tool payload expected by Azure AI Agents
+        tool = AzureAISearchTool(
+            index_connection_id=index_connection_id,
+            index_name=index_name,
+            query_type=AzureAISearchQueryType(query_type),
+            top_k=top_k,
+            filter=filter_expr,
+        )
+        self._search_tool_cache[key] = tool
+        return tool
+    
+    async def get_agent_id(self, agent_type: Literal["diagnostic", "solution"], existing_agent_id: Optional[str] = None) -> Optional[str]:
+        """Get or create a service-managed Azure Agent for the given type.
+
+        - diagnostic: attaches AI Search tool with phase='diagnosis' and stricter TSG protocol
+        - solution: attaches AI Search tool with phase='solution' and solution instructions
+        """
+        # Fast path: the id for this agent type was already resolved.
+        cached_type_id = self._agent_type_ids.get(agent_type)
+        if cached_type_id:
+            return cached_type_id
+
+        # Try existing ID first if provided. Returning here keeps the warm
+        # path free of any env reads or AzureAISearchTool allocation; the
+        # search tool is only built below when the agent must be created.
+        if existing_agent_id:
+            resolved = await self._try_get_agent_id(existing_agent_id)
+            if resolved:
+                self._agent_type_ids[agent_type] = resolved
+                return resolved
+
+        cfg = AGENT_CONFIGS[agent_type]
+
+        # Before creating (which re-uploads the multi-KB instructions), probe
+        # the service for an existing agent with the same name and reuse it.
+        existing_by_name = await self._find_agent_by_name(cfg["name"])
+        if existing_by_name:
+            self._agent_type_ids[agent_type] = existing_by_name
+            return existing_by_name
+
+        # Cold path: materialize the AI Search tool payload for this agent
+        # type (memoized; see _search_tool_payload)
+        tool_definitions, tool_resources = self._search_tool_payload(agent_type)
+
+        # Create the agent when not found
+        agent = await self._agents_client.create_agent(
+            model=self._model_deployment_name,
+            name=cfg["name"],
+            instructions=cfg["instructions"],
+            tools=tool_definitions,
+            tool_resources=tool_resources,
+            temperature=cfg["temperature"],
+        )
+        self._agent_name_cache[cfg["name"]] = agent.id
+        self._agent_type_ids[agent_type] = agent.id
+        return agent.id
+
+    def _search_tool_payload(self, agent_type: str) -> tuple:
+        """Return cached (definitions, resources) for the agent type's search tool.
+
+        Both are pure functions of the tool config, so they are materialized
+        once per factory instead of re-traversed on every create_agent call.
+        """
+        cached = self._search_tool_payload_cache.get(agent_type)
+        if cached is not None:
+            return cached
+        cfg = AGENT_CONFIGS[agent_type]
+        ai_search = self._make_ai_search_tool(
+            filter_expr=cfg["filter"],
+            query_type=cfg["query_type"],
+            top_k=cfg["top_k"],
+        )
+        payload = (
+            ai_search.definitions if ai_search else None,
+            ai_search.resources if ai_search else None,
+        )
+        self._search_tool_payload_cache[agent_type] = payload
+        return payload
+
+    async def _find_agent_by_name(self, name: str) -> Optional[str]:
+        """Scan server-side agents for a matching name, memoized per factory.
+
+        Listing is one lightweight paginated call versus re-sending the full
+        instructions + tool config through create_agent.
+        """
+        from azure.core.exceptions import HttpResponseError, ServiceRequestError
+
+        cached = self._agent_name_cache.get(name)
+        if cached:
+            return cached
+        try:
+            async for existing in self._agents_client.list_agents():
+                if existing.name == name:
+                    self._agent_name_cache[name] = existing.id
+                    return existing.id
+        except (HttpResponseError, ServiceRequestError) as e:
+            logger.warning(f"Failed to list agents while probing for '{name}': {e}")
+        return None
+
+    async def get_agent_ids(
+        self,
+        types: Sequence[Literal["diagnostic", "solution"]],
+        existing_ids: Optional[dict[str, str]] = None,
+    ) -> dict[str, Optional[str]]:
+        """Resolve agent ids for several agent types concurrently.
+
+        All probes (and any create_agent fallbacks) are in flight together,
+        so cold-start wall-clock is bounded by the slowest type rather than
+        the sum. Defaults to the known AGENT_IDS for the probe step.
+        """
+        existing_ids = existing_ids if existing_ids is not None else self.AGENT_IDS
+        results = await asyncio.gather(
+            *[self.get_agent_id(t, existing_ids.get(t)) for t in types]
+        )
+        return dict(zip(types, results))
+
+    async def prewarm(self) -> None:
+        """Resolve both agent ids concurrently to warm the shared cache.
+
+        Intended for app startup so the first workflow request pays no
+        probe round-trips.
+        """
+        await self.get_agent_ids(("diagnostic", "solution"))
+
+    async def create_diagnostic_agent(self) -> ChatAgent:
+        from agent_framework import ChatAgent
+
+        cached = self._chat_agents.get("diagnostic")
+        if cached is not None:
+            return cached
+        lock = self._chat_agent_locks.setdefault("diagnostic", asyncio.Lock())
+        async with lock:
+            cached = self._chat_agents.get("diagnostic")
+            if cached is not None:
+                return cached
+
+            # Get or create the service-managed Diagnostic agent, warming the
+            # credential token in parallel. TaskGroup scopes both awaits so a
+            # cancelled caller cannot leak a half-built agent.
+            async with asyncio.TaskGroup() as tg:
+                id_task = tg.create_task(
+                    self.get_agent_id("diagnostic", self.AGENT_IDS["diagnostic"])
+                )
+                tg.create_task(
+                    self._credential.get_token("https://cognitiveservices.azure.com/.default")
+                )
+            diag_agent_id = id_task.result()
+
+            chat_client = self._get_chat_client(diag_agent_id)
+
+            agent = ChatAgent(chat_client=chat_client, tools=self._tools, **DIAG_AGENT_KW)
+            self._chat_agents["diagnostic"] = agent
+            return agent
+
+    async def create_solution_agent(self) -> ChatAgent:
+        from agent_framework import ChatAgent
+
+        cached = self._chat_agents.get("solution")
+        if cached is not None:
+            return cached
+        lock = self._chat_agent_locks.setdefault("solution", asyncio.Lock())
+        async with lock:
+            cached = self._chat_agents.get("solution")
+            if cached is not None:
+                return cached
+
+            # Get or create the service-managed Solution agent, warming the
+            # credential token in parallel (see create_diagnostic_agent).
+            async with asyncio.TaskGroup() as tg:
+                id_task = tg.create_task(
+                    self.get_agent_id("solution", self.AGENT_IDS["solution"])
+                )
+                tg.create_task(
+                    self._credential.get_token("https://cognitiveservices.azure.com/.default")
+                )
+            sol_agent_id = id_task.result()
+
+            chat_client = self._get_chat_client(sol_agent_id)
+
+            agent = ChatAgent(chat_client=chat_client, **SOL_AGENT_KW)
+            self._chat_agents["solution"] = agent
+            return agent
+
+    async def create_agents(self) -> tuple[ChatAgent, ChatAgent]:
+        """Create the diagnostic and solution agents concurrently.
+
+        Both construction paths are independent and dominated by Azure
+        round-trips, so issuing them together cuts bootstrap wall-clock to
+        max(T_diag, T_sol) instead of their sum.
+        """
+        diag_agent, sol_agent = await asyncio.gather(
+            self.create_diagnostic_agent(),
+            self.create_solution_agent(),
+        )
+        return diag_agent, sol_agent
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Optional
+
+# Repeated ReAct loops ask for the same (resource, symptom) combinations
+# many times; each miss costs an LLM call plus an AI Search query. This
+# cache returns the prior structured response for prompts that normalize
+# to the same canonical form. Matching is exact on the normalized SHA-256
+# key: conservative (no false hits) and dependency-free.
+
+# Replica-set / pod-template hash suffixes (e.g. "-7b88fd64b6-tcfzj") make
+# otherwise identical prompts look distinct; strip them before hashing.
+_POD_HASH_SUFFIX = re.compile(r"-[0-9a-f]{8,10}-[a-z0-9]{5}\b")
+_WHITESPACE_RUN = re.compile(r"[ \t]+")
+
+
+def canonicalize_json_text(text: str) -> str:
+    """Return a key-sorted compact rendering when text is a JSON value.
+
+    ReAct iterations often differ only by key order or whitespace inside
+    an action_input blob; re-serializing with sorted keys makes those
+    equivalent inputs hash identically. Non-JSON text passes through.
+    """
+    stripped = text.strip()
+    if not stripped or stripped[0] not in "[{":
+        return text
+    try:
+        obj = json.loads(stripped)
+    except (ValueError, TypeError):
+        return text
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+@lru_cache(maxsize=4096)
+def normalize_prompt(text: str) -> str:
+    """Canonicalize a prompt so equivalent requests share a cache key.
+
+    Canonicalizes embedded JSON, lowercases, strips pod-template hash
+    suffixes, collapses runs of spaces, and drops per-line trailing
+    whitespace.
+    """
+    text = canonicalize_json_text(text)
+    lines = []
+    for line in text.lower().splitlines():
+        line = _POD_HASH_SUFFIX.sub("", line)
+        line = _WHITESPACE_RUN.sub(" ", line).rstrip()
+        lines.append(line)
+    return "\n".join(lines).strip()
+
+
+def _cache_key(prompt: str) -> str:
+    return hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+
+
+class SemanticAgentCache:
+    """TTL + LRU cache of structured agent responses keyed by normalized prompt."""
+
+    def __init__(self, max_entries: int = 10_000, ttl_seconds: Optional[float] = None):
+        if ttl_seconds is None:
+            ttl_seconds = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        # key -> (monotonic ts, value); OrderedDict gives cheap LRU eviction
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def get(self, prompt: str) -> Optional[Any]:
+        key = _cache_key(prompt)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        ts, value = entry
+        if time.monotonic() - ts > self._ttl_seconds:
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, prompt: str, value: Any) -> None:
+        key = _cache_key(prompt)
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+
+# Process-wide cache for solution-agent responses keyed by the handoff
+# prompt (resource + root cause); diagnostic steps stay uncached because
+# the ReAct loop depends on fresh observations.
+SOLUTION_RESPONSE_CACHE = SemanticAgentCache()
@@ -1,10 +1,21 @@
+import asyncio
+import json
 import time
 from datetime import datetime
+from urllib.parse import urlencode
 import httpx
-from azure.identity import DefaultAzureCredential
-from fastapi import APIRouter, HTTPException, Query, Body
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore
+from azure.identity.aio import DefaultAzureCredential
+from fastapi import APIRouter, HTTPException, Query, Body, Response
 from app.models import HealthIssue, ResourceType
 from typing import List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 # 1. Get the Query Endpoint from your Azure Monitor Workspace "Overview" page
@@ -12,9 +23,54 @@ router = APIRouter()
 PROMETHEUS_QUERY_ENDPOINT = "https://defaultazuremonitorworkspace-wus2-ephda2e6e0dteqfh.westus2.prometheus.monitor.azure.com"
 PROMETHEUS_TOKEN_SCOPE = "https://prometheus.monitor.azure.com/.default"
 
-# Initialize credential (this will automatically use your ServiceAccount token in AKS)
+# Initialize credential (this will automatically use your ServiceAccount token in AKS).
+# The aio variant keeps token acquisition off the event loop's back: the
+# sync credential's get_token does blocking socket I/O (IMDS/MSI) that
+# would stall every concurrent request.
 credential = DefaultAzureCredential()
 
+# Shared HTTP client so connection pooling amortizes TCP/TLS handshakes
+# across requests instead of paying one per Prometheus query. HTTP/2
+# multiplexes concurrent queries over one connection (check
+# response.http_version when debugging).
+# Client-side timeout stays under the ASGI worker timeout, and the
+# server-side "timeout" form field (below) budgets under the client's so
+# one slow query can't starve the loop.
+_client = httpx.AsyncClient(
+    base_url=PROMETHEUS_QUERY_ENDPOINT,
+    http2=True,
+    timeout=httpx.Timeout(5.0, connect=2.0),
+    limits=httpx.Limits(
+        max_connections=100,
+        max_keepalive_connections=20,
+        keepalive_expiry=300,
+    ),
+)
+
+
+async def close_http_client() -> None:
+    """Close the shared Prometheus HTTP client and credential (app shutdown)."""
+    await _client.aclose()
+    await credential.close()
+
+# Cached AAD token for the Prometheus scope; tokens live ~1h, so most
+# requests reuse it and skip the credential lookup entirely.
+_TOKEN_REFRESH_MARGIN_SECONDS = 300
+_token_lock = asyncio.Lock()
+_cached_token = None
+
+
+async def _get_prometheus_token() -> str:
+    """Return a valid bearer token, refreshing shortly before expiry."""
+    global _cached_token
+    if _cached_token and _cached_token.expires_on - time.time() > _TOKEN_REFRESH_MARGIN_SECONDS:
+        return _cached_token.token
+    async with _token_lock:
+        if _cached_token and _cached_token.expires_on - time.time() > _TOKEN_REFRESH_MARGIN_SECONDS:
+            return _cached_token.token
+        _cached_token = await credential.get_token(PROMETHEUS_TOKEN_SCOPE)
+        return _cached_token.token
+
 @router.get("/metrics/test", response_model=List[HealthIssue])
 async def mock_prometheus():
     """Return a mocked list of pod-related HealthIssue items.
@@ -66,92 +122,271 @@ def format_duration(seconds: float) -> str:
     minutes, seconds = divmod(rem, 60)
     return f"{hours:02}h {minutes:02}m"
 
+# Short per-query result cache plus single-flight coalescing: N identical
+# concurrent PromQL queries (dashboard polls, multiple tabs) collapse into
+# one Prometheus round-trip and share the answer for a couple of seconds.
+_QUERY_CACHE_TTL_SECONDS = 2.0
+_query_cache: dict[str, tuple[float, list]] = {}
+_query_inflight: dict[str, asyncio.Task] = {}
+
+# Caches are keyed by user-influenced values (query/namespace/limit), so
+# cap them; oldest entries are evicted past the bound.
+_CACHE_MAX_ENTRIES = 256
+
+
+def _evict_oldest(cache: dict, max_entries: int = _CACHE_MAX_ENTRIES) -> None:
+    while len(cache) > max_entries:
+        oldest = min(cache, key=lambda k: cache[k][0])
+        cache.pop(oldest, None)
+
+
 async def fetch_prom(query: str, token: str):
-    # Use POST to avoid URL length and character encoding issues
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"{PROMETHEUS_QUERY_ENDPOINT}/api/v1/query", # Ensure this is the base endpoint /api/v1/query
-            data={"query": query}, # 'data' in httpx sends form-encoded POST
-            headers={
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/x-www-form-urlencoded"
-            }
+    cached = _query_cache.get(query)
+    if cached and time.monotonic() - cached[0] < _QUERY_CACHE_TTL_SECONDS:
+        return cached[1]
+    task = _query_inflight.get(query)
+    if task is None:
+        task = asyncio.create_task(_fetch_prom_uncached(query, token))
+        _query_inflight[query] = task
+        task.add_done_callback(lambda _t, q=query: _query_inflight.pop(q, None))
+    return await task
+
+
+# Bodies above this size are JSON-decoded in a worker thread instead of
+# on the event loop (orjson releases the GIL while parsing).
+_PARSE_OFFLOAD_THRESHOLD_BYTES = 1 << 20
+
+# Cached "Bearer ..." header string; rebuilt only when the token rotates
+_auth_header: tuple[str, str] = ("", "")
+
+
+def _bearer(token: str) -> str:
+    global _auth_header
+    if _auth_header[0] != token:
+        _auth_header = (token, f"Bearer {token}")
+    return _auth_header[1]
+
+
+# Bound the Prometheus fan-out so request bursts don't push the backend
+# into throttling and tail-latency spikes.
+_prom_sem = asyncio.Semaphore(16)
+
+
+async def _fetch_prom_uncached(query: str, token: str):
+    # Use POST to avoid URL length and character encoding issues. Stream
+    # the body into one buffer so the read overlaps network transfer and
+    # large range-query responses aren't buffered twice (httpx internal
+    # buffer + .json()).
+    buf = bytearray()
+    try:
+        async with _prom_sem:
+            async with _client.stream(
+                "POST",
+                "/api/v1/query",
+                # Pre-encoded form body skips httpx's per-call dict
+                # normalization; the timeout field caps query evaluation
+                # server-side below the 5s client budget.
+                content=urlencode((("query", query), ("timeout", "4s"))).encode("ascii"),
+                headers={
+                    "Authorization": _bearer(token),
+                    "Content-Type": "application/x-www-form-urlencoded"
+                }
+            ) as response:
+                async for chunk in response.aiter_raw(65536):
+                    buf += chunk
+    except httpx.TimeoutException:
+        # Re-raise so /health/issues can serve its stale fallback; an empty
+        # result here would be cached as a legitimate "no issues" answer.
+        logger.warning("Prometheus query timed out: %.120s", query)
+        raise
+    # Single error branch: log once and raise so callers see the real
+    # failure instead of silently treating an outage as "no results".
+    # logger formats lazily and doesn't take the stdout lock like print.
+    if response.status_code != 200:
+        logger.warning(
+            "Prometheus query failed: status=%s body=%.200s",
+            response.status_code,
+            buf[:400].decode(errors="replace"),
         )
-        if response.status_code != 200:
-            print(f"Error: {response.status_code} - {response.text}")
-            return []
-        return response.json().get("data", {}).get("result", [])
+        response.raise_for_status()
+    # orjson parses large result payloads 2-3x faster than stdlib json;
+    # very large bodies are parsed off the event loop so thousands of
+    # series don't stall every other request for tens of ms.
+    if orjson is not None:
+        if len(buf) > _PARSE_OFFLOAD_THRESHOLD_BYTES:
+            payload = await asyncio.to_thread(orjson.loads, bytes(buf))
+        else:
+            payload = orjson.loads(buf)
+    else:
+        payload = json.loads(bytes(buf))
+    result = payload.get("data", {}).get("result", [])
+    _query_cache[query] = (time.monotonic(), result)
+    _evict_oldest(_query_cache)
+    return result
+
+# Short-TTL response cache for /health/issues keyed by namespace; the
+# endpoint is idempotent over a few seconds and dashboards poll it hard,
+# so cache hits skip the whole Prometheus fan-out. Per-key locks stop a
+# thundering herd from recomputing the same namespace concurrently.
+_ISSUES_CACHE_TTL_SECONDS = 5.0
+_issues_cache: dict[str, tuple[float, List[HealthIssue]]] = {}
+_issues_locks: dict[str, asyncio.Lock] = {}
 
-@router.get("/health/issues", response_model=List[HealthIssue])
-async def get_all_health_issues(namespace: Optional[str] = Query(None, description="Namespace to filter issues by")):
+# Last successful payload per namespace, kept longer than the TTL cache so
+# a Prometheus outage degrades to a slightly stale dashboard, not a 502.
+_STALE_MAX_AGE_SECONDS = 600.0
+_issues_last_good: dict[str, tuple[float, List[HealthIssue]]] = {}
+
+
+# response_model intentionally omitted: rows are built trusted via
+# construct_issue and re-validating them on the way out doubles the cost.
+@router.get("/health/issues")
+async def get_all_health_issues(
+    response: Response,
+    namespace: Optional[str] = Query(None, description="Namespace to filter issues by"),
+    limit: int = Query(500, ge=1, le=5000, description="Maximum series returned per issue class"),
+):
     """
     Returns a list of health issues for pods, nodes, and deployments.
-    Optionally filter by namespace.
+    Optionally filter by namespace. Responses are cached for a few seconds
+    per namespace; Cache-Control lets browsers skip the server entirely.
     """
+    key = f"{namespace or '__all__'}:{limit}"
+    response.headers["Cache-Control"] = f"max-age={int(_ISSUES_CACHE_TTL_SECONDS)}"
+    cached = _issues_cache.get(key)
+    if cached and time.monotonic() - cached[0] < _ISSUES_CACHE_TTL_SECONDS:
+        return cached[1]
+    lock = _issues_locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        cached = _issues_cache.get(key)
+        if cached and time.monotonic() - cached[0] < _ISSUES_CACHE_TTL_SECONDS:
+            return cached[1]
+        try:
+            issues = await _compute_health_issues(namespace, limit)
+        except HTTPException:
+            # Cache fallback: serve the last good answer during Prometheus
+            # failures instead of breaking the dashboard.
+            stale = _issues_last_good.get(key)
+            if stale and time.monotonic() - stale[0] < _STALE_MAX_AGE_SECONDS:
+                logger.warning("Serving stale /health/issues for namespace=%s after Prometheus failure", key)
+                response.headers["X-Served-Stale"] = "true"
+                return stale[1]
+            raise
+        _issues_cache[key] = (time.monotonic(), issues)
+        _issues_last_good[key] = (time.monotonic(), issues)
+        _evict_oldest(_issues_cache)
+        _evict_oldest(_issues_last_good)
+        if len(_issues_locks) > _CACHE_MAX_ENTRIES:
+            _issues_locks.clear()
+        return issues
+
+
+# PromQL built once as module-level templates; label values are escaped
+# before interpolation so a namespace containing quotes or backslashes
+# cannot break out of the selector (PromQL injection).
+_POD_Q_NS = (
+    '(kube_pod_container_status_waiting_reason{{namespace="{ns}"}} == 1) '
+    '* on(pod) group_left '
+    'kube_pod_created{{namespace="{ns}"}}'
+)
+_NODE_Q_NS = 'kube_node_status_condition{{condition="Ready", status!="true", namespace="{ns}"}} == 1'
+_DEP_Q_NS = 'kube_deployment_status_replicas_unavailable{{namespace="{ns}"}} > 0'
+_POD_Q = (
+    '(kube_pod_container_status_waiting_reason == 1) '
+    '* on(pod) group_left '
+    'kube_pod_created'
+)
+_NODE_Q = 'kube_node_status_condition{condition="Ready", status!="true"} == 1'
+_DEP_Q = 'kube_deployment_status_replicas_unavailable > 0'
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+async def _compute_health_issues(namespace: Optional[str], limit: int = 500) -> List[HealthIssue]:
     try:
-        token = credential.get_token(PROMETHEUS_TOKEN_SCOPE).token
+        token = await _get_prometheus_token()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get Azure token: {e}")
     now = time.time()
     all_issues = []
 
-    import asyncio
     try:
         # 1. THE POWER QUERY: Gets Reason + Transition Time (or Created time as fallback)
         # This query joins the error reason with the creation time of that pod
         if namespace:
-            pod_query = (
-                f'(kube_pod_container_status_waiting_reason{{namespace="{namespace}"}} == 1) '
-                '* on(pod) group_left '
-                f'kube_pod_created{{namespace="{namespace}"}}'
-            )
-            node_query = f'kube_node_status_condition{{condition="Ready", status!="true", namespace="{namespace}"}} == 1'
-            dep_query = f'kube_deployment_status_replicas_unavailable{{namespace="{namespace}"}} > 0'
+            ns = _escape_label_value(namespace)
+            pod_query = _POD_Q_NS.format(ns=ns)
+            node_query = _NODE_Q_NS.format(ns=ns)
+            dep_query = _DEP_Q_NS.format(ns=ns)
         else:
-            pod_query = (
-                '(kube_pod_container_status_waiting_reason == 1) '
-                '* on(pod) group_left '
-                'kube_pod_created'
-            )
-            node_query = 'kube_node_status_condition{condition="Ready", status!="true"} == 1'
-            dep_query = 'kube_deployment_status_replicas_unavailable > 0'
-    
-        pod_results, node_results, dep_results = await asyncio.gather(
-            fetch_prom(pod_query, token),
-            fetch_prom(node_query, token),
-            fetch_prom(dep_query, token)
+            pod_query = _POD_Q
+            node_query = _NODE_Q
+            dep_query = _DEP_Q
+
+        # Cap each class with topk so huge clusters don't serialize and
+        # ship thousands of series the UI would never render.
+        pod_query = f"topk({limit}, ({pod_query}))"
+        node_query = f"topk({limit}, ({node_query}))"
+        dep_query = f"topk({limit}, ({dep_query}))"
+
+        # One union query with a synthetic issue_kind label (not __-prefixed;
+        # double-underscore labels are reserved and may be stripped) collapses the
+        # three HTTP round-trips and PromQL planner runs into a single
+        # request; rows are dispatched back out per kind below.
+        union_query = (
+            f'label_replace(({pod_query}), "issue_kind", "pod", "", "") or '
+            f'label_replace(({node_query}), "issue_kind", "node", "", "") or '
+            f'label_replace(({dep_query}), "issue_kind", "deployment", "", "")'
         )
+        rows = await fetch_prom(union_query, token)
+        pod_results = [r for r in rows if r["metric"].get("issue_kind") == "pod"]
+        node_results = [r for r in rows if r["metric"].get("issue_kind") == "node"]
+        dep_results = [r for r in rows if r["metric"].get("issue_kind") == "deployment"]
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Failed to query Prometheus: {e}")
 
     # --- 1. POD ISSUES (CrashLoop or Not Running) ---
-    for item in pod_results:
+    # Batch the timespan arithmetic and duration formatting into single
+    # passes before building the rows; on large result sets this keeps the
+    # per-row work to dict lookups and one constructor call.
+    pod_spans = [int(now - float(item["value"][1])) for item in pod_results]
+    pod_since = [format_duration(span) for span in pod_spans]
+    for item, timespan, since in zip(pod_results, pod_spans, pod_since):
         labels = item["metric"]
         reason = labels.get("reason", "Pending")
-        created_at = float(item["value"][1])
-        timespan = int(now - created_at)
-        all_issues.append(HealthIssue(
+        all_issues.append(HealthIssue.construct_issue(
             issueType=reason,
             severity="High",
             resourceType=ResourceType.Pod,
             namespace=labels.get("namespace"),
             resourceName=labels.get("pod"),
             container=labels.get("container"),
-            unhealthySince=format_duration(timespan),
+            unhealthySince=since,
             unhealthyTimespan=timespan,
             message=f"Container is in {reason} state."
         ))
 
     # --- 2. NODE ISSUES (Not Ready) ---
-    for item in node_results:
-        node_name = item["metric"]["node"]
+    # One batched query returns every node's last transition time, instead
+    # of one round-trip per unhealthy node.
+    transitions_by_node: dict[str, float] = {}
+    if node_results:
         try:
-            since_res = await fetch_prom(f'kube_node_status_condition_last_transition_time{{node="{node_name}", condition="Ready"}}', token)
-            start_time = float(since_res[0]["value"][1]) if since_res else now
+            transitions = await fetch_prom(
+                'kube_node_status_condition_last_transition_time{condition="Ready"}', token
+            )
+            transitions_by_node = {
+                t["metric"]["node"]: float(t["value"][1]) for t in transitions
+            }
         except Exception:
-            start_time = now
+            pass
+    for item in node_results:
+        node_name = item["metric"]["node"]
+        start_time = transitions_by_node.get(node_name, now)
         timespan = int(now - start_time)
-        all_issues.append(HealthIssue(
+        all_issues.append(HealthIssue.construct_issue(
             issueType="NodeNotReady",
             severity="Critical",
             resourceType=ResourceType.Node,
@@ -163,7 +398,7 @@ async def get_all_health_issues(namespace: Optional[str] = Query(None, descripti
 
     # --- 3. DEPLOYMENT ISSUES (Degraded) ---
     for item in dep_results:
-        all_issues.append(HealthIssue(
+        all_issues.append(HealthIssue.construct_issue(
             issueType="DeploymentDegraded",
             severity="High",
             resourceType=ResourceType.Deployment,
@@ -1,9 +1,18 @@
+import asyncio
 import os
 import json
 import logging
+import re
 import time
+from collections import deque
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore
 from typing import Optional, Literal, Any
 from dotenv import load_dotenv
+from pydantic import TypeAdapter
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from app.models import HealthIssue, AgentState, WebSocketPayload, SolutionResponse, MessageItem
 from azure.identity.aio import DefaultAzureCredential
@@ -11,6 +20,8 @@ from azure.ai.projects.aio import AIProjectClient
 from azure.ai.agents.aio import AgentsClient
 from azure.ai.agents.models import ListSortOrder
 from app.agents.agent_factory import AgentFactory
+from app.workflow_store import IssueThreadStore
+from app.agents.semantic_cache import SOLUTION_RESPONSE_CACHE
 from agent_framework import ChatAgent
 from app.skills.k8s_diag import create_tools
 from app.skills.mock_k8s_diag import create_mock_tools
@@ -27,28 +38,40 @@ logger.propagate = False           # prevent double logging via root
 
 router = APIRouter()
  
-# In-memory mapping of issueId -> threads (per-process)
+# Mapping of issueId -> threads, Redis-backed when REDIS_URL is set so
+# multiple uvicorn workers share it; in-process otherwise.
 # { issueId: { 'diag_thread_id': str, 'sol_thread_id': Optional[str] } }
-ISSUE_THREAD_MAP: dict[str, dict] = {}
+ISSUE_THREADS = IssueThreadStore()
 
 @router.delete("/workflow/threads/{issue_id}")
 async def reset_issue_threads(issue_id: str):
-    """Remove the given issue_id from ISSUE_THREAD_MAP.
+    """Remove the given issue_id from the issue thread store.
 
     This allows the frontend to clear cached diagnostic/solution threads
     and re-attempt troubleshooting from a clean slate.
 
     Returns a simple status payload indicating whether a mapping existed.
     """
-    existed = issue_id in ISSUE_THREAD_MAP
     try:
-        ISSUE_THREAD_MAP.pop(issue_id, None)
-        logger.info(f"Cleared ISSUE_THREAD_MAP entry for issueId={issue_id}; existed={existed}")
+        existed = await ISSUE_THREADS.delete(issue_id)
+        logger.info(f"Cleared thread store entry for issueId={issue_id}; existed={existed}")
         return {"status": "ok", "deleted": bool(existed)}
     except Exception as e:
-        logger.error(f"Failed to clear ISSUE_THREAD_MAP for issueId={issue_id}: {e}")
+        logger.error(f"Failed to clear thread store for issueId={issue_id}: {e}")
         return {"status": "error", "detail": str(e)}
 
+async def _send_payload(ws: WebSocket, payload: dict) -> None:
+    """Serialize and send one websocket frame, using orjson when available.
+
+    Frames stay one-per-event (the frontend consumes discrete JSON
+    messages); only the serialization moves off stdlib json.dumps.
+    """
+    if orjson is not None:
+        await ws.send_text(orjson.dumps(payload).decode())
+    else:
+        await ws.send_json(payload)
+
+
 async def _send_thread_histories(
     ws: WebSocket,
     agents_client: AgentsClient,
@@ -57,27 +80,41 @@ async def _send_thread_histories(
     diag_thread_id: Optional[str],
     sol_thread_id: Optional[str] = None,
 ):
-    diag_history = []
-    sol_history = []
-    if diag_thread_id:
-        try:
-            diag_history = await _get_clean_history(agents_client, diag_thread_id)
-        except Exception as e:
-            logger.warning(f"Failed to load diagnostic history for {diag_thread_id}: {e}")
-    if sol_thread_id:
+    async def _safe_history(thread_id: str, label: str) -> list[dict]:
         try:
-            sol_history = await _get_clean_history(agents_client, sol_thread_id)
+            return await _get_clean_history(agents_client, thread_id)
         except Exception as e:
-            logger.warning(f"Failed to load solution history for {sol_thread_id}: {e}")
-    payload = WebSocketPayload(
-        event="history",
-        issueId=issue_id,
-        diag_thread_id=diag_thread_id,
-        sol_thread_id=sol_thread_id,
-        diag_history=[MessageItem(**h) for h in diag_history],
-        sol_history=[MessageItem(**h) for h in sol_history],
-    )
-    await ws.send_json(payload.model_dump())
+            logger.warning(f"Failed to load {label} history for {thread_id}: {e}")
+            return []
+
+    # The two fetches are independent paginated network calls; overlap
+    # them so the history event waits for the slower, not the sum.
+    diag_history: list[dict] = []
+    sol_history: list[dict] = []
+    if diag_thread_id and sol_thread_id:
+        diag_history, sol_history = await asyncio.gather(
+            _safe_history(diag_thread_id, "diagnostic"),
+            _safe_history(sol_thread_id, "solution"),
+        )
+    elif diag_thread_id:
+        diag_history = await _safe_history(diag_thread_id, "diagnostic")
+    elif sol_thread_id:
+        sol_history = await _safe_history(sol_thread_id, "solution")
+    # Rows from _get_clean_history are already {"role","text"} dicts, so
+    # build the frame directly and skip the MessageItem/WebSocketPayload
+    # construct+dump round-trip per row. The field set mirrors
+    # WebSocketPayload so the wire shape is unchanged.
+    await _send_payload(ws, {
+        "event": "history",
+        "issueId": issue_id,
+        "diag_thread_id": diag_thread_id,
+        "sol_thread_id": sol_thread_id,
+        "state": None,
+        "status": None,
+        "diag_history": diag_history,
+        "sol_history": sol_history,
+        "question": None,
+    })
 
 async def _ask_resume(ws: WebSocket, *, issue_id: str, diag_thread_id: str) -> bool:
     payload = WebSocketPayload(
@@ -86,7 +123,7 @@ async def _ask_resume(ws: WebSocket, *, issue_id: str, diag_thread_id: str) -> b
         diag_thread_id=diag_thread_id,
         question="Resume previous diagnostic?",
     )
-    await ws.send_json(payload.model_dump())
+    await _send_payload(ws, payload.model_dump())
     try:
         msg = await ws.receive_json()
     except WebSocketDisconnect:
@@ -98,17 +135,131 @@ async def _ask_resume(ws: WebSocket, *, issue_id: str, diag_thread_id: str) -> b
         return True
     return False
 
+# Shared Azure clients, built lazily and reused across websocket
+# connections; constructing them per connection paid an AAD handshake and
+# fresh TLS connections every time.
+_clients_lock = asyncio.Lock()
+_shared_clients: Optional[tuple[AIProjectClient, AgentsClient, DefaultAzureCredential]] = None
+
 async def _get_clients() -> tuple[AIProjectClient, AgentsClient, DefaultAzureCredential]:
-    endpoint = os.environ.get("AZURE_AI_PROJECT_ENDPOINT")
-    if not endpoint:
-        raise RuntimeError("AZURE_AI_PROJECT_ENDPOINT not configured")
-    credential = DefaultAzureCredential()
-    project_client = AIProjectClient(endpoint=endpoint, credential=credential)
-    agents_client = AgentsClient(endpoint=endpoint, credential=credential)
-    return project_client, agents_client, credential
-
-async def _get_clean_history(agents_client: AgentsClient, thread_id: str, user_message_included: bool = False) -> list[dict]:
-    history: list[dict] = []
+    global _shared_clients
+    if _shared_clients is not None:
+        return _shared_clients
+    async with _clients_lock:
+        if _shared_clients is not None:
+            return _shared_clients
+        endpoint = os.environ.get("AZURE_AI_PROJECT_ENDPOINT")
+        if not endpoint:
+            raise RuntimeError("AZURE_AI_PROJECT_ENDPOINT not configured")
+        credential = DefaultAzureCredential()
+        project_client = AIProjectClient(endpoint=endpoint, credential=credential)
+        agents_client = AgentsClient(endpoint=endpoint, credential=credential)
+        _shared_clients = (project_client, agents_client, credential)
+        return _shared_clients
+
+async def close_clients() -> None:
+    """Close the shared Azure clients (called on app shutdown)."""
+    global _shared_clients
+    if _shared_clients is None:
+        return
+    project_client, agents_client, credential = _shared_clients
+    _shared_clients = None
+    for closer in (agents_client, project_client, credential):
+        try:
+            await closer.close()
+        except Exception as e:
+            logger.warning(f"Failed to close shared client: {e}")
+
+async def prewarm_agents() -> None:
+    """Resolve agent ids at startup so the first workflow request is warm.
+
+    The resolved ids land in the module-level cache shared by all
+    factories, and the shared clients stay open for later connections.
+    """
+    project_client, agents_client, credential = await _get_clients()
+    factory = AgentFactory(
+        project_client=project_client,
+        agents_client=agents_client,
+        credential=credential,
+    )
+    await factory.prewarm()
+
+# Bound concurrent LLM runs across all websocket sessions so a burst of
+# UI reconnects self-paces below the Azure OpenAI RPM/TPM limits instead
+# of triggering 429 storms. Sized via LLM_MAX_CONCURRENCY; a full AIMD
+# controller is overkill until 429s are actually observed here.
+_llm_sem = asyncio.Semaphore(int(os.getenv("LLM_MAX_CONCURRENCY", "10")))
+
+
+# Built once so pydantic-core reuses the same validator handle instead of
+# re-resolving it through class attributes on every fallback validation.
+_AGENT_STATE_ADAPTER = TypeAdapter(AgentState)
+
+# Bound .format of a static template: one formatting call per connection
+# instead of re-assembling the f-string fragments, and the prompt shape
+# lives in one place.
+_START_INPUT_TEMPLATE = (
+    "Investigate the issue {issue_type} for {resource_type} "
+    "[resourceName={resource_name}, container={container}, namespace={namespace}]."
+).format
+
+
+def _parse_state(text: str) -> Optional[AgentState]:
+    """Parse agent output into an AgentState, cheaply.
+
+    The JSON comes from our own agent, so the common well-formed case uses
+    orjson + model_construct and skips pydantic validation; anything with
+    an unexpected shape falls back to full validation, and non-JSON text
+    returns None.
+    """
+    # O(1) bail-out for prose/markdown preambles ("Thought: ..."), which
+    # otherwise pay full parser cost on every non-JSON step.
+    s = text.lstrip()
+    if not s.startswith("{"):
+        return None
+    if len(s) > 256_000:
+        # Bound pathological outputs: extract the object from a capped
+        # slice instead of handing megabytes to the parser.
+        m = re.search(r"\{.*\}", s[:256_000], re.S)
+        if not m:
+            return None
+        s = m.group(0)
+    try:
+        data = orjson.loads(s) if orjson is not None else json.loads(s)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(data, dict):
+        return None
+    if "thought" in data and "next_action" in data:
+        fields = {k: v for k, v in data.items() if k in AgentState.model_fields}
+        return AgentState.model_construct(**fields)
+    try:
+        return _AGENT_STATE_ADAPTER.validate_python(data)
+    except Exception:
+        return None
+
+
+# Outputs larger than this are parsed in a worker thread so one huge
+# reasoning trace can't stall every other websocket session on the loop.
+_PARSE_OFFLOAD_THRESHOLD_CHARS = 16_384
+
+
+async def _parse_state_async(text: str) -> Optional[AgentState]:
+    if len(text) > _PARSE_OFFLOAD_THRESHOLD_CHARS:
+        return await asyncio.to_thread(_parse_state, text)
+    return _parse_state(text)
+
+
+async def _get_clean_history(
+    agents_client: AgentsClient,
+    thread_id: str,
+    user_message_included: bool = False,
+    max_messages: int = 200,
+) -> list[dict]:
+    # messages.list yields newest first; appendleft builds chronological
+    # order directly, replacing the collect-then-reverse pass, and the cap
+    # stops pagination once the newest max_messages are in hand.
+    history: deque[dict] = deque()
     async for message in agents_client.messages.list(thread_id=thread_id):
         if user_message_included is False and message.role == "user":
             continue
@@ -116,9 +267,10 @@ async def _get_clean_history(agents_client: AgentsClient, thread_id: str, user_m
         if getattr(message, "text_messages", None):
             texts = [tm.text.value for tm in message.text_messages if hasattr(tm, "text")]
             text = texts[-1] if texts else text
-        history.append({"role": message.role, "text": text})
-    history.reverse()
-    return history
+        history.appendleft({"role": message.role, "text": text})
+        if len(history) >= max_messages:
+            break
+    return list(history)
 
 async def _get_last_message_text(agents_client: AgentsClient, thread_id: str) -> str:
     last_text = ""
@@ -141,7 +293,11 @@ async def _flush_diag_stream(
     start_time = time.monotonic()
     first_token_latency: float | None = None
     buffer = ""
-    try:
+    # Last diagnostic frame sent; identical re-parses of the same state
+    # (partial-JSON re-decodes) are suppressed instead of re-sent.
+    last_sent_frame: Optional[dict] = None
+    async def _consume() -> None:
+        nonlocal first_token_latency, buffer, last_sent_frame
         async for update in diag_agent.run_stream(current_input, thread=diag_thread):
             if update.text is None:
                 continue
@@ -152,17 +308,18 @@ async def _flush_diag_stream(
                     f"Diagnostic stream first token latency: {first_token_latency:.3f}s "
                     f"[issueId={issue_id}, threadId={getattr(diag_thread, 'service_thread_id', None)}]"
                 )
-                # Update ISSUE_THREAD_MAP immediately on first token
+                # Record the diag thread immediately on first token
                 try:
-                    if issue_id not in ISSUE_THREAD_MAP:
-                        ISSUE_THREAD_MAP[issue_id] = {}
-                    ISSUE_THREAD_MAP[issue_id]["diag_thread_id"] = getattr(diag_thread, "service_thread_id", None)
+                    await ISSUE_THREADS.update(
+                        issue_id,
+                        diag_thread_id=getattr(diag_thread, "service_thread_id", None),
+                    )
                     logger.info(
-                        f"UPDATED ISSUE_THREAD_MAP on first token: {ISSUE_THREAD_MAP} "
+                        f"Updated thread store on first token "
                         f"for issueId={issue_id} and diag_thread_id={getattr(diag_thread, 'service_thread_id', None)}"
                     )
                 except Exception as e:
-                    logger.warning(f"Failed to update ISSUE_THREAD_MAP on first token: {e}")
+                    logger.warning(f"Failed to update thread store on first token: {e}")
 
             buffer += update.text
             decoder = json.JSONDecoder()
@@ -173,22 +330,70 @@ async def _flush_diag_stream(
                 try:
                     obj, end = decoder.raw_decode(buffer[start:])
                     # logger.debug(f"Parsed diagnostic object: {obj}")
-                    state_flush = AgentState.model_validate(obj)
+                    # Single-pass bind through the cached validator handle
+                    state_flush = _AGENT_STATE_ADAPTER.validate_python(obj)
                     payload = WebSocketPayload(
                         event="diagnostic",
                         issueId=issue_id,
                         diag_thread_id=getattr(diag_thread, "service_thread_id", None),
                         state=state_flush,
                     )
-                    await ws.send_json(payload.model_dump())
-                    logger.debug(f"Sent diagnostic; thought preview: {state_flush.thought[:50]}...")
+                    frame = payload.model_dump()
+                    if frame != last_sent_frame:
+                        await _send_payload(ws, frame)
+                        last_sent_frame = frame
+                        logger.debug(f"Sent diagnostic; thought preview: {state_flush.thought[:50]}...")
                     buffer = buffer[start + end:]
                 except json.JSONDecodeError:
                     break
                 except Exception as e:
                     logger.warning(f"Validation error while parsing stream: {e}")
                     buffer = buffer[start + 1:]
+
+    # Run the stream as a task and watch the socket concurrently, so a
+    # client disconnect cancels the in-flight LLM call instead of letting
+    # it burn tokens against a dead connection. The client is not
+    # expected to send during streaming; stray frames are dropped.
+    consume_task = asyncio.create_task(_consume())
+    watch_task = asyncio.create_task(ws.receive())
+    try:
+        while True:
+            done, _ = await asyncio.wait(
+                {consume_task, watch_task}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if consume_task in done:
+                break
+            try:
+                frame = watch_task.result()
+            except Exception:
+                frame = {"type": "websocket.disconnect"}
+            if frame.get("type") == "websocket.disconnect":
+                consume_task.cancel()
+                try:
+                    await consume_task
+                except asyncio.CancelledError:
+                    pass
+                raise WebSocketDisconnect(1001)
+            logger.warning(
+                f"Dropping unexpected websocket frame during diagnostic stream: {frame.get('type')}"
+            )
+            watch_task = asyncio.create_task(ws.receive())
+        await consume_task
     finally:
+        if not watch_task.done():
+            watch_task.cancel()
+        else:
+            # The watcher may have consumed a frame right as the stream
+            # ended; the protocol sends nothing during streaming, so make
+            # the discard visible instead of silently losing a reply.
+            try:
+                leftover = watch_task.result()
+            except Exception:
+                leftover = None
+            if leftover and leftover.get("type") == "websocket.receive":
+                logger.warning(
+                    f"Discarding websocket frame received at end of diagnostic stream [issueId={issue_id}]"
+                )
         total_stream_time = time.monotonic() - start_time
         if first_token_latency is not None:
             logger.debug(
@@ -203,12 +408,11 @@ async def _flush_diag_stream(
             )
         # Ensure diag_thread_id is persisted; do not overwrite if already set
         if diag_thread:
-            if issue_id not in ISSUE_THREAD_MAP:
-                ISSUE_THREAD_MAP[issue_id] = {}
-            if not ISSUE_THREAD_MAP[issue_id].get("diag_thread_id"):
-                ISSUE_THREAD_MAP[issue_id]["diag_thread_id"] = diag_thread.service_thread_id
+            mapping = await ISSUE_THREADS.get(issue_id)
+            if not mapping.get("diag_thread_id"):
+                await ISSUE_THREADS.update(issue_id, diag_thread_id=diag_thread.service_thread_id)
                 logger.info(
-                    f"---UPDATED ISSUE_THREAD_MAP: {ISSUE_THREAD_MAP} "
+                    f"---Updated thread store "
                     f"for issueId={issue_id} and diag_thread_id={diag_thread.service_thread_id}---"
                 )
 
@@ -227,7 +431,7 @@ async def _ask_intervention(
         diag_thread_id=diag_thread_id,
         question=question,
     )
-    await ws.send_json(payload.model_dump())
+    await _send_payload(ws, payload.model_dump())
     try:
         decision_msg = await ws.receive_json()
     except WebSocketDisconnect:
@@ -237,7 +441,7 @@ async def _ask_intervention(
         return None
 
     if decision_msg.get("type") != "intervene":
-        await ws.send_json({
+        await _send_payload(ws, {
             "event": "error",
             "detail": "Expected intervene message",
             "issueId": issue_id,
@@ -256,29 +460,59 @@ async def _run_solution_and_emit(
     issue_id: str,
     diag_thread,
 ):
-    sol_agent = await factory.create_solution_agent()
-    sol_thread = sol_agent.get_new_thread()
     prompt = (
         f"Provide solution or escalation email for the issue {issue.issueType} for {issue.resourceType} "
         f"[resourceName={issue.resourceName}, container={issue.container}, namespace={issue.namespace}]. "
         f"Diagnostic root cause: [{state.root_cause}]. Other evidence: [{state.thought}]. "
         f"If Application crash, you need to create ESCALATE EMAIL!"
     )
+
+    # Serve a cached structured solution for an equivalent handoff prompt;
+    # a hit skips both the LLM call and the AI Search query. Only the
+    # structured state is cached — thread ids belong to whichever issue
+    # produced the response and must not leak into this issue's frames or
+    # mapping — so hits emit sol_thread_id=None and merge (not replace)
+    # the stored threads for this issue.
+    cached = SOLUTION_RESPONSE_CACHE.get(prompt)
+    if cached is not None:
+        logger.info(f"Solution response cache hit for issueId={issue_id}; skipping solution agent run")
+        try:
+            await ISSUE_THREADS.update(
+                issue_id,
+                diag_thread_id=getattr(diag_thread, "service_thread_id", None),
+            )
+        except Exception:
+            pass
+        await _emit_solution_events(
+            ws,
+            agents_client,
+            issue_id=issue_id,
+            diag_thread=diag_thread,
+            sol_thread_id=None,
+            solution_state=cached,
+        )
+        return
+
+    sol_agent = await factory.create_solution_agent()
+    sol_thread = sol_agent.get_new_thread()
     # Stream solution agent to capture first/last token latency
     sol_start = time.monotonic()
     sol_first_token_latency: float | None = None
-    sol_buffer = ""
+    # Collect chunks and join once; += on a growing string is quadratic
+    # over long transcripts.
+    sol_chunks: list[str] = []
     try:
-        async for update in sol_agent.run_stream(prompt, thread=sol_thread):
-            if update.text is None:
-                continue
-            if sol_first_token_latency is None:
-                sol_first_token_latency = time.monotonic() - sol_start
-                logger.debug(
-                    f"Solution stream first token latency: {sol_first_token_latency:.3f}s "
-                    f"[issueId={issue_id}, threadId={getattr(sol_thread, 'service_thread_id', None)}]"
-                )
-            sol_buffer += update.text
+        async with _llm_sem:
+            async for update in sol_agent.run_stream(prompt, thread=sol_thread):
+                if update.text is None:
+                    continue
+                if sol_first_token_latency is None:
+                    sol_first_token_latency = time.monotonic() - sol_start
+                    logger.debug(
+                        f"Solution stream first token latency: {sol_first_token_latency:.3f}s "
+                        f"[issueId={issue_id}, threadId={getattr(sol_thread, 'service_thread_id', None)}]"
+                    )
+                sol_chunks.append(update.text)
     finally:
         sol_total = time.monotonic() - sol_start
         if sol_first_token_latency is not None:
@@ -292,12 +526,13 @@ async def _run_solution_and_emit(
                 f"[issueId={issue_id}, threadId={getattr(sol_thread, 'service_thread_id', None)}]"
             )
 
+    sol_buffer = "".join(sol_chunks)
     sol_thread_id = getattr(sol_thread, "service_thread_id", None)
     try:
-        ISSUE_THREAD_MAP[issue_id] = {
+        await ISSUE_THREADS.set(issue_id, {
             "diag_thread_id": getattr(diag_thread, "service_thread_id", None),
             "sol_thread_id": sol_thread_id,
-        }
+        })
     except Exception:
         pass
 
@@ -309,6 +544,28 @@ async def _run_solution_and_emit(
     except Exception as e:
         logger.warning(f"Failed to parse solution response into structured JSON: {e}")
 
+    if solution_state is not None:
+        SOLUTION_RESPONSE_CACHE.put(prompt, solution_state)
+
+    await _emit_solution_events(
+        ws,
+        agents_client,
+        issue_id=issue_id,
+        diag_thread=diag_thread,
+        sol_thread_id=sol_thread_id,
+        solution_state=solution_state,
+    )
+
+
+async def _emit_solution_events(
+    ws: WebSocket,
+    agents_client: AgentsClient,
+    *,
+    issue_id: str,
+    diag_thread,
+    sol_thread_id: Optional[str],
+    solution_state: Optional[SolutionResponse],
+):
     handoff_payload = WebSocketPayload(
         event="handoff",
         issueId=issue_id,
@@ -317,7 +574,7 @@ async def _run_solution_and_emit(
         state=solution_state,
     )
     try:
-        await ws.send_json(handoff_payload.model_dump())
+        await _send_payload(ws, handoff_payload.model_dump())
     except Exception as e:
         logger.warning(f"WebSocket send failed for handoff: {e}")
         return
@@ -332,7 +589,7 @@ async def _run_solution_and_emit(
         )
     except Exception as e:
         logger.warning(f"Failed to send thread histories post-handoff: {e}")
-    
+
     complete_payload = WebSocketPayload(
         event="complete",
         status="handoff",
@@ -341,7 +598,7 @@ async def _run_solution_and_emit(
         sol_thread_id=sol_thread_id,
     )
     try:
-        await ws.send_json(complete_payload.model_dump())
+        await _send_payload(ws, complete_payload.model_dump())
     except Exception as e:
         logger.warning(f"WebSocket send failed for complete: {e}")
         return
@@ -355,6 +612,36 @@ def get_skills(issue_type: str, is_mock: bool):
     else:
         return create_tools()
 
+# Factories (and the ChatAgents they memoize) are reusable across
+# connections now that the Azure clients are shared singletons; only the
+# tool profile differs, so cache one factory per profile.
+_factory_lock = asyncio.Lock()
+_factory_cache: dict[str, AgentFactory] = {}
+
+
+async def _get_factory(issue_type: str, is_mock: bool) -> AgentFactory:
+    if is_mock:
+        profile = "mock-imagepullbackoff" if issue_type == "ImagePullBackOff" else "mock-crashloop"
+    else:
+        profile = "live"
+    factory = _factory_cache.get(profile)
+    if factory is not None:
+        return factory
+    async with _factory_lock:
+        factory = _factory_cache.get(profile)
+        if factory is not None:
+            return factory
+        project_client, agents_client, credential = await _get_clients()
+        factory = AgentFactory(
+            project_client=project_client,
+            agents_client=agents_client,
+            credential=credential,
+            tools=get_skills(issue_type, is_mock),
+        )
+        _factory_cache[profile] = factory
+        return factory
+
+
 @router.websocket("/workflow/ws")
 async def workflow_ws(
     ws: WebSocket,
@@ -368,29 +655,31 @@ async def workflow_ws(
     try:
         init_msg = await ws.receive_json()
         if init_msg.get("type") != "start" or not init_msg.get("issue"):
-            await ws.send_json({"event": "error", "detail": "First message must be type=start with 'issue'"})
+            await _send_payload(ws, {"event": "error", "detail": "First message must be type=start with 'issue'"})
             await ws.close()
             return
 
         issue = HealthIssue(**init_msg["issue"])
         project_client, agents_client, credential = await _get_clients()
 
-        tools = get_skills(issue.issueType, is_mock)
-        factory = AgentFactory(project_client=project_client, agents_client=agents_client, credential=credential, tools=tools)
+        factory = await _get_factory(issue.issueType, is_mock)
         # Measure connection time for diagnostic agent creation
         connect_start = time.monotonic()
         diag_agent = await factory.create_diagnostic_agent()
         connect_duration = time.monotonic() - connect_start
         logger.debug(f"Connected to diagnostic agent in {connect_duration:.3f}s")
 
-        start_input = (
-            f"Investigate the issue {issue.issueType} for {issue.resourceType} "
-            f"[resourceName={issue.resourceName}, container={issue.container}, namespace={issue.namespace}]."
+        start_input = _START_INPUT_TEMPLATE(
+            issue_type=issue.issueType,
+            resource_type=issue.resourceType,
+            resource_name=issue.resourceName,
+            container=issue.container,
+            namespace=issue.namespace,
         )
 
         # Use issueId mapping to show history, resume, or start new
         issue_id = issue.issueId or ""
-        mapping = ISSUE_THREAD_MAP.get(issue_id) or {}
+        mapping = await ISSUE_THREADS.get(issue_id)
         existing_diag_id = mapping.get("diag_thread_id")
         existing_sol_id = mapping.get("sol_thread_id")
         diag_thread = None
@@ -420,9 +709,9 @@ async def workflow_ws(
                         diag_thread_id=existing_diag_id,
                         sol_thread_id=existing_sol_id,
                         diag_history=[],
-                        sol_history=[MessageItem(role="assistant", text=last_sol_text)] if last_sol_text else [],
+                        sol_history=[MessageItem.model_construct(role="assistant", text=last_sol_text)] if last_sol_text else [],
                     )
-                    await ws.send_json(payload.model_dump())
+                    await _send_payload(ws, payload.model_dump())
                 except Exception as e3:
                     logger.warning(f"Fallback history send failed: {e3}")
             if existing_sol_id:
@@ -435,7 +724,7 @@ async def workflow_ws(
                     sol_thread_id=existing_sol_id,
                 )
                 try:
-                    await ws.send_json(payload.model_dump())
+                    await _send_payload(ws, payload.model_dump())
                 except Exception as e:
                     logger.warning(f"WebSocket send failed for existing complete: {e}")
                 return
@@ -456,7 +745,7 @@ async def workflow_ws(
                     issueId=issue_id,
                     diag_thread_id=existing_diag_id,
                 )
-                await ws.send_json(payload.model_dump())
+                await _send_payload(ws, payload.model_dump())
                 return
         else:
             diag_thread = diag_agent.get_new_thread()
@@ -464,24 +753,29 @@ async def workflow_ws(
 
         step_count = 0
         max_steps = 12
-        
+
+        # Bind loop-invariant helpers to locals: LOAD_FAST in the stepped
+        # loop instead of repeated global lookups per iteration.
+        flush_stream = _flush_diag_stream
+        fetch_history = _get_clean_history
+        parse_state = _parse_state_async
+        send_payload = _send_payload
+        ask_intervention = _ask_intervention
+
         while step_count < max_steps:
             step_count += 1
-            await _flush_diag_stream(
-                ws,
-                diag_agent,
-                diag_thread,
-                current_input=current_input,
-                issue_id=issue_id,
-            )
+            async with _llm_sem:
+                await flush_stream(
+                    ws,
+                    diag_agent,
+                    diag_thread,
+                    current_input=current_input,
+                    issue_id=issue_id,
+                )
 
-            history = await _get_clean_history(agents_client, diag_thread.service_thread_id or "")
+            history = await fetch_history(agents_client, diag_thread.service_thread_id or "")
             last_text = history[-1]["text"] if history else ""
-            state: Optional[AgentState] = None
-            try:
-                state = AgentState.model_validate_json(last_text)
-            except Exception:
-                state = None
+            state = await parse_state(last_text)
 
             if len(history) >= 50:
                 payload = WebSocketPayload(
@@ -490,112 +784,88 @@ async def workflow_ws(
                     issueId=issue_id,
                     diag_thread_id=getattr(diag_thread, "service_thread_id", None),
                 )
-                await ws.send_json(payload.model_dump())
+                await send_payload(ws, payload.model_dump())
                 break
 
             if not state:
                 current_input = "Continue."
                 continue
 
-            if state.next_action == "handoff_to_solution_agent":
-                decision = await _ask_intervention(
-                    ws,
-                    issue_id=issue_id,
-                    diag_thread_id=getattr(diag_thread, "service_thread_id", None) or "",
-                    question=f"Root cause: {state.root_cause} Proceed to handoff to solution agent?",
-                    event_name="handoff_approval",
-                )
-                if decision == "approve":
-                    await _run_solution_and_emit(
+            # match dispatches next_action via a jump table instead of a
+            # chained comparison cascade per step.
+            match state.next_action:
+                case "handoff_to_solution_agent":
+                    decision = await ask_intervention(
                         ws,
-                        agents_client,
-                        factory,
-                        issue=issue,
-                        state=state,
                         issue_id=issue_id,
-                        diag_thread=diag_thread,
-                    )
-                    break
-                elif decision == "deny":
-                    current_input = "Handoff DENIED. Continue diagnosis."
-                    continue
-                else:
-                    payload = WebSocketPayload(
-                        event="error",
-                        issueId=issue_id,
-                        diag_thread_id=getattr(diag_thread, "service_thread_id", None),
+                        diag_thread_id=getattr(diag_thread, "service_thread_id", None) or "",
+                        question=f"Root cause: {state.root_cause} Proceed to handoff to solution agent?",
+                        event_name="handoff_approval",
                     )
-                    await ws.send_json(payload.model_dump())
-                    break
-
-            if state.next_action == "await_user_approval":
-                d = await _ask_intervention(
-                    ws,
-                    issue_id=issue_id,
-                    diag_thread_id=getattr(diag_thread, "service_thread_id", None) or "",
-                    question=f"Current investigation: {state.thought}. Approve next action?",
-                    event_name="awaiting_approval",
-                )
-                if d == "approve":
-                    current_input = "Action APPROVED. Proceed."
-                    continue
-                elif d == "deny":
-                    # We can accept an optional hint via a second message if desired in future
-                    current_input = "Action DENIED."
-                    continue
-                elif d == "handoff":
-                    current_input = "Manual Handoff requested."
-                    continue
-                else:
-                    payload = WebSocketPayload(
-                        event="error",
-                        issueId=issue_id,
-                        diag_thread_id=getattr(diag_thread, "service_thread_id", None),
+                    if decision == "approve":
+                        await _run_solution_and_emit(
+                            ws,
+                            agents_client,
+                            factory,
+                            issue=issue,
+                            state=state,
+                            issue_id=issue_id,
+                            diag_thread=diag_thread,
+                        )
+                        break
+                    elif decision == "deny":
+                        current_input = "Handoff DENIED. Continue diagnosis."
+                        continue
+                    else:
+                        payload = WebSocketPayload(
+                            event="error",
+                            issueId=issue_id,
+                            diag_thread_id=getattr(diag_thread, "service_thread_id", None),
+                        )
+                        await send_payload(ws, payload.model_dump())
+                        break
+
+                case "await_user_approval":
+                    d = await ask_intervention(
+                        ws,
+                        issue_id=issue_id,
+                        diag_thread_id=getattr(diag_thread, "service_thread_id", None) or "",
+                        question=f"Current investigation: {state.thought}. Approve next action?",
+                        event_name="awaiting_approval",
                     )
-                    await ws.send_json(payload.model_dump())
-                    break
-
-            current_input = "Continue."
+                    if d == "approve":
+                        current_input = "Action APPROVED. Proceed."
+                        continue
+                    elif d == "deny":
+                        # We can accept an optional hint via a second message if desired in future
+                        current_input = "Action DENIED."
+                        continue
+                    elif d == "handoff":
+                        current_input = "Manual Handoff requested."
+                        continue
+                    else:
+                        payload = WebSocketPayload(
+                            event="error",
+                            issueId=issue_id,
+                            diag_thread_id=getattr(diag_thread, "service_thread_id", None),
+                        )
+                        await send_payload(ws, payload.model_dump())
+                        break
+
+                case _:
+                    current_input = "Continue."
 
     except WebSocketDisconnect:
         logger.info("WebSocket disconnected")
     except Exception as e:
         logger.error(f"Error in workflow_ws: {e}")
-        await ws.send_json({"event": "error", "detail": str(e)})
+        await _send_payload(ws, {"event": "error", "detail": str(e)})
     finally:
-        # Proper cleanup with error handling for each client
-        cleanup_errors = []
-
-        # Close agents_client
-        if agents_client:
-            try:
-                await agents_client.close()
-                logger.info("agents_client closed")
-            except Exception as e:
-                cleanup_errors.append(f"agents_client: {e}")
-        
-        # Close project_client
-        if project_client:
-            try:
-                await project_client.close()
-                logger.info("project_client closed")
-            except Exception as e:
-                cleanup_errors.append(f"project_client: {e}")
-        
-        # Close credential
-        if credential:
-            try:
-                await credential.close()
-                logger.info("credential closed")
-            except Exception as e:
-                cleanup_errors.append(f"credential: {e}")
-        
-        # Close WebSocket
+        # The Azure clients and credential are shared across connections
+        # and stay open until app shutdown (close_clients); only the
+        # WebSocket belongs to this connection.
         try:
             await ws.close()
             logger.info("WebSocket closed")
         except Exception as e:
             logger.error(f"Error closing WebSocket: {e}")
-        
-        if cleanup_errors:
-            logger.warning(f"Cleanup completed with errors: {cleanup_errors}")
@@ -1,14 +1,36 @@
+import logging
+import os
+
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
-from app.api.metrics import router as metrics_router
-from app.api.workflow_api import router as workflow_router
+
+# orjson is optional elsewhere (metrics falls back to stdlib json), so the
+# faster response class is opt-in on availability rather than a hard import.
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as _DefaultResponseClass
+except ImportError:  # pragma: no cover
+    from fastapi.responses import JSONResponse as _DefaultResponseClass
+from app.api.metrics import router as metrics_router, close_http_client
+from app.api.workflow_api import router as workflow_router, prewarm_agents, close_clients, ISSUE_THREADS
+
+logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Resolve agent ids up front so the first request skips the probe RTTs
+    if os.environ.get("AZURE_AI_PROJECT_ENDPOINT"):
+        try:
+            await prewarm_agents()
+        except Exception as e:
+            logger.warning(f"Agent prewarm failed: {e}")
     yield
-    # await close_project_client()
+    await close_clients()
+    await close_http_client()
+    await ISSUE_THREADS.close()
 
-app = FastAPI(title="Health Aggregator API", lifespan=lifespan)
+# ORJSONResponse serializes response models with orjson's C encoder
+app = FastAPI(title="Health Aggregator API", lifespan=lifespan, default_response_class=_DefaultResponseClass)
 
 app.include_router(metrics_router, prefix="/api")
 app.include_router(workflow_router, prefix="/api")
@@ -40,6 +40,18 @@ class HealthIssue(BaseModel):
             self.issueId = self.compute_issue_id()
         return self
 
+    @classmethod
+    def construct_issue(cls, **fields) -> "HealthIssue":
+        """Build a HealthIssue without validation for trusted internal data.
+
+        model_construct skips validators entirely, so the issueId default
+        normally filled by _populate_issue_id is computed here instead.
+        """
+        issue = cls.model_construct(**fields)
+        if not issue.issueId:
+            issue.issueId = issue.compute_issue_id()
+        return issue
+
 class AgentState(BaseModel):
     thought: str
     action: Optional[str] = None
@@ -0,0 +1,126 @@
+import logging
+import os
+import time
+from typing import Optional
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover
+    aioredis = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# Entries describe live troubleshooting sessions; an hour of idleness
+# means the thread is stale enough to restart, and the size bound keeps a
+# long-running server from accumulating one entry per issue forever.
+DEFAULT_TTL_SECONDS = 3600.0
+DEFAULT_MAX_ENTRIES = 10_000
+
+
+class IssueThreadStore:
+    """Mapping of issueId -> diagnostic/solution thread ids.
+
+    A plain module dict breaks under uvicorn --workers > 1: a reconnect
+    can land on a worker that never saw the issue. When REDIS_URL is set
+    (and the redis package is installed) the store is backed by one Redis
+    hash per issue so every worker shares it; otherwise it degrades to
+    the in-process dict with the same semantics as before.
+    """
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        redis_url = redis_url if redis_url is not None else os.getenv("REDIS_URL")
+        self._redis = None
+        if redis_url and aioredis is not None:
+            self._redis = aioredis.from_url(redis_url, decode_responses=True, max_connections=32)
+        elif redis_url:
+            logger.warning("REDIS_URL is set but the redis package is not installed; using the in-process store")
+        self._ttl_seconds = ttl_seconds
+        self._max_entries = max_entries
+        # issue_id -> (monotonic ts, mapping)
+        self._local: dict[str, tuple[float, dict]] = {}
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        expired = [k for k, (ts, _) in self._local.items() if now - ts > self._ttl_seconds]
+        for k in expired:
+            logger.info(f"Evicting expired thread store entry for issueId={k}")
+            self._local.pop(k, None)
+        while len(self._local) > self._max_entries:
+            oldest = min(self._local, key=lambda k: self._local[k][0])
+            logger.info(f"Evicting thread store entry for issueId={oldest} (store full)")
+            self._local.pop(oldest, None)
+
+    @staticmethod
+    def _key(issue_id: str) -> str:
+        return f"wf:{issue_id}"
+
+    async def get(self, issue_id: str) -> dict:
+        if self._redis is not None:
+            try:
+                return await self._redis.hgetall(self._key(issue_id))
+            except Exception as e:
+                logger.warning(f"Redis get failed for issueId={issue_id}: {e}")
+        entry = self._local.get(issue_id)
+        if entry is None:
+            return {}
+        ts, mapping = entry
+        if time.monotonic() - ts > self._ttl_seconds:
+            self._local.pop(issue_id, None)
+            return {}
+        return dict(mapping)
+
+    async def set(self, issue_id: str, mapping: dict) -> None:
+        """Replace the stored mapping for an issue."""
+        if self._redis is not None:
+            try:
+                key = self._key(issue_id)
+                fields = {k: v for k, v in mapping.items() if v}
+                await self._redis.delete(key)
+                if fields:
+                    await self._redis.hset(key, mapping=fields)
+                    await self._redis.expire(key, int(self._ttl_seconds))
+                return
+            except Exception as e:
+                logger.warning(f"Redis set failed for issueId={issue_id}: {e}")
+        self._local[issue_id] = (time.monotonic(), dict(mapping))
+        self._prune()
+
+    async def update(self, issue_id: str, **fields) -> None:
+        """Merge fields into the stored mapping for an issue."""
+        fields = {k: v for k, v in fields.items() if v}
+        if not fields:
+            return
+        if self._redis is not None:
+            try:
+                key = self._key(issue_id)
+                await self._redis.hset(key, mapping=fields)
+                await self._redis.expire(key, int(self._ttl_seconds))
+                return
+            except Exception as e:
+                logger.warning(f"Redis update failed for issueId={issue_id}: {e}")
+        ts, mapping = self._local.get(issue_id) or (0.0, {})
+        mapping = dict(mapping)
+        mapping.update(fields)
+        self._local[issue_id] = (time.monotonic(), mapping)
+        self._prune()
+
+    async def delete(self, issue_id: str) -> bool:
+        """Remove the issue's mapping; returns whether one existed."""
+        if self._redis is not None:
+            try:
+                return bool(await self._redis.delete(self._key(issue_id)))
+            except Exception as e:
+                logger.warning(f"Redis delete failed for issueId={issue_id}: {e}")
+        return self._local.pop(issue_id, None) is not None
+
+    async def close(self) -> None:
+        if self._redis is not None:
+            try:
+                await self._redis.aclose()
+            except Exception as e:
+                logger.warning(f"Failed to close Redis connection: {e}")
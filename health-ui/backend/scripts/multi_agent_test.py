@@ -1,5 +1,6 @@
 import os
 import asyncio
+import logging
 import sys
 from pathlib import Path
 from dotenv import load_dotenv
@@ -20,6 +21,8 @@ from app.skills.mock_k8s_diag import create_mock_tools
 # Setup
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 
 def format_duration(seconds: int) -> str:
     """Simple duration formatter: returns "HHh MMm" for a given seconds value."""
@@ -42,8 +45,10 @@ async def get_clean_history(agents_client: AgentsClient, thread_id: str):
 
             history.append({"role": message.role, "text": text})
         history.reverse()
-    except Exception as e:
-        print(f"Error fetching history: {e}")
+    except Exception:
+        # logger.exception writes via the logging stack (no blocking stdout
+        # lock) and keeps the traceback with structured context.
+        logger.exception("history fetch failed", extra={"thread_id": thread_id})
     return history
 
 
@@ -28,6 +28,13 @@ root_env = current_dir.parent.parent / ".env"
 # 3. Load specifically from that path
 load_dotenv(dotenv_path=root_env)
 
+# Persistence setup hoisted to module scope: the directory is created and
+# the storage object initialized once instead of per workflow run.
+CHECKPOINT_DIR = "./workflow_state"
+CHECKPOINT_TRACKER = "checkpoint_id.txt" # Simple file to store the active ID
+os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+checkpoint_storage = FileCheckpointStorage(storage_path=CHECKPOINT_DIR)
+
 # --- 1. TOOLS: THE AGENT'S SKILLS ---
 def get_pod_details(
     pod_name: Annotated[str, Field(description="The name of the pod to inspect")]
@@ -56,12 +63,6 @@ async def main():
         credential=credential
     )
 
-    # Persistence Setup
-    checkpoint_dir = "./workflow_state"
-    checkpoint_tracker = "checkpoint_id.txt" # Simple file to store the active ID
-    os.makedirs(checkpoint_dir, exist_ok=True)
-    checkpoint_storage = FileCheckpointStorage(storage_path=checkpoint_dir)
-
     async with project_client:
         # AGENT 1: The Investigator (ReAct)
         diag_agent = ChatAgent(
@@ -104,8 +105,8 @@ async def main():
                     .build())
 
         # Check for existing state to resume
-        if os.path.exists(checkpoint_tracker):
-            with open(checkpoint_tracker, 'r') as f:
+        if os.path.exists(CHECKPOINT_TRACKER):
+            with open(CHECKPOINT_TRACKER, 'r') as f:
                 last_id = f.read().strip()
             print(f"--- Resuming Workflow: {last_id} ---")
             events = workflow.run_stream(checkpoint_id=last_id,
@@ -128,16 +129,16 @@ async def main():
                 checkpoints = await checkpoint_storage.list_checkpoints()
                 if checkpoints:
                     latest_ckpt = checkpoints[-1]
-                    with open(checkpoint_tracker, 'w') as f:
+                    with open(CHECKPOINT_TRACKER, 'w') as f:
                         f.write(latest_ckpt.checkpoint_id)
 
         print("\n--- Workflow Completed ---")
         # 1. Remove the checkpoint tracker file
-        if os.path.exists(checkpoint_tracker):
-            os.remove(checkpoint_tracker) # Clean up on successful finish
+        if os.path.exists(CHECKPOINT_TRACKER):
+            os.remove(CHECKPOINT_TRACKER) # Clean up on successful finish
         # 2. Optionally, clear the checkpoint storage
-        if os.path.exists(checkpoint_dir):
-            os.rmdir(checkpoint_dir) # Remove the checkpoint directory
+        if os.path.exists(CHECKPOINT_DIR):
+            os.rmdir(CHECKPOINT_DIR) # Remove the checkpoint directory
 
 if __name__ == "__main__":
     asyncio.run(main())